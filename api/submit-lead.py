@@ -2,6 +2,8 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import sys
+import threading
+import uuid
 from pathlib import Path
 import logging
 
@@ -11,95 +13,179 @@ logger = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-# Try to import Google Sheets
-try:
-    from integrations.google_sheets import GoogleSheetsManager
-    sheets_manager = None
+from integrations.lead_schema import validate_lead
+
+# The Google Sheets pipeline is built on first use and cached across warm
+# invocations, so a cold start does no Google imports, auth or API calls
+_sheets_sink = None
+_sheets_loaded = False
+_sheets_lock = threading.Lock()
+
+def get_sheets_sink():
+    """Return the Sheets outbox, creating it on the first call"""
+    global _sheets_sink, _sheets_loaded
+    if _sheets_loaded:
+        return _sheets_sink
+    with _sheets_lock:
+        if not _sheets_loaded:
+            # Published before the flag, so concurrent first requests never
+            # see the flag set while the sink is still being built
+            _sheets_sink = _build_sheets_sink()
+            _sheets_loaded = True
+        return _sheets_sink
+
+def _build_sheets_sink():
     spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
-    credentials_b64 = os.getenv('GOOGLE_CREDENTIALS_JSON_B64')
-    if spreadsheet_id and credentials_b64:
-        try:
-            sheets_manager = GoogleSheetsManager(credentials_file=None, spreadsheet_id=spreadsheet_id)
-            if not (sheets_manager and hasattr(sheets_manager, 'initialized') and sheets_manager.initialized):
-                sheets_manager = None
-        except:
-            sheets_manager = None
-except:
-    sheets_manager = None
+    if not (spreadsheet_id and os.getenv('GOOGLE_CREDENTIALS_JSON_B64')):
+        return None
+    try:
+        from integrations.google_sheets import GoogleSheetsManager
+        from integrations.sheets_scheduler import QuotaScheduler
+        # Lazy: connects when the outbox first delivers, after the response
+        sheets_manager = GoogleSheetsManager(credentials_file=None, spreadsheet_id=spreadsheet_id, lazy=True)
+        sheets_scheduler = QuotaScheduler.from_env(sheets_manager)
+    except Exception as e:
+        logger.error(f"Google Sheets integration unavailable: {e}")
+        return None
+    # Record sheet rows in an outbox under /tmp (the only writable path on
+    # Vercel); rows that fail are retried by later warm invocations
+    try:
+        from integrations.sheets_outbox import SheetsOutbox
+        return SheetsOutbox(os.getenv('SHEETS_OUTBOX', '/tmp/sheets_outbox.db'), sheets_scheduler)
+    except Exception as e:
+        logger.warning(f"Sheets outbox unavailable, using in-memory sink: {e}")
+        from integrations.sheets_sink import SheetsSink
+        return SheetsSink(sheets_scheduler, max_batch_size=100, max_delay=0.5)
+
+# First response per Idempotency-Key, kept for the life of a warm instance
+# (or shared through IDEMPOTENCY_DB)
+_idempotency = None
+
+def get_idempotency_cache():
+    global _idempotency
+    if _idempotency is None:
+        from integrations.idempotency import IdempotencyCache
+        _idempotency = IdempotencyCache.from_env()
+    return _idempotency
+
+# Rate limits and a concurrency cap on submissions, kept per warm instance.
+# Vercel's edge sets X-Forwarded-For, so one proxy hop is trusted by default.
+_admission = None
+
+def get_admission():
+    global _admission
+    if _admission is None:
+        from integrations.admission import AdmissionController
+        _admission = AdmissionController.from_env(trusted_proxies=1)
+    return _admission
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
         self.end_headers()
     
     def do_POST(self):
+        # Over-limit requests are turned away before the body is read
+        from integrations.admission import ADMITTED
+        admission = get_admission()
+        client = admission.client(self.client_address[0], self.headers.get('X-Forwarded-For'))
+        outcome, retry_after = admission.admit(client)
+        if outcome != ADMITTED:
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Retry-After', admission.retry_after_header(retry_after))
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Too many requests, please try again shortly'}).encode())
+            return
         try:
-            # Parse request
-            content_length = int(self.headers.get('Content-Length', 0))
-            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
-            
-            # Validate required fields
-            required = ['service', 'name', 'phone', 'email', 'place']
-            if any(not data.get(f) for f in required):
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Missing required fields'}).encode())
+            self._handle_post()
+        finally:
+            admission.release()
+    
+    def _send_json(self, status, body, extra_headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+    
+    def _handle_post(self):
+        idempotency_key = self.headers.get('Idempotency-Key')
+        if idempotency_key:
+            from integrations.idempotency import MAX_KEY_LENGTH, REPLAY, IN_PROGRESS
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                self._send_json(400, {'error': 'Idempotency-Key is too long'})
                 return
-            
-            # Validate service-specific fields
-            service = data.get('service')
-            if service == 'Education India' and (not data.get('education_place') or not data.get('course')):
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Missing Education India fields'}).encode())
+            outcome, stored = get_idempotency_cache().reserve(idempotency_key)
+            if outcome == REPLAY:
+                self._send_json(stored[0], stored[1], [('Idempotent-Replayed', 'true')])
                 return
-            elif service == 'Education Abroad' and not data.get('education_country'):
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Missing Education Abroad field'}).encode())
+            if outcome == IN_PROGRESS:
+                self._send_json(409, {'error': 'Request already in progress'})
                 return
-            elif service == 'Job Europe' and not data.get('work'):
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({'error': 'Missing Job Europe field'}).encode())
+        
+        self.idempotent_response_stored = False
+        try:
+            self._submit_lead(idempotency_key)
+        finally:
+            # Keys of requests that failed with a server error are released
+            # for retries
+            if idempotency_key and not self.idempotent_response_stored:
+                get_idempotency_cache().release(idempotency_key)
+    
+    def _submit_lead(self, idempotency_key):
+        try:
+            # Parse request; a body that is not JSON fails validation below
+            content_length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            except ValueError:
+                data = None
+            
+            # Validate and normalise against the shared lead schema
+            lead, error = validate_lead(data)
+            if error:
+                # Remembered like any other 4xx, as server.py does
+                if idempotency_key:
+                    get_idempotency_cache().complete(idempotency_key, 400, error)
+                    self.idempotent_response_stored = True
+                self._send_json(400, error)
                 return
             
-            # Try to save to Google Sheets in background (ignore all errors)
-            if sheets_manager:
+            # Record for Google Sheets delivery; this function stores no
+            # leads, so the id in the sheet's User ID column is returned to
+            # the caller for later status updates
+            lead_id = uuid.uuid4().hex
+            sheets_sink = get_sheets_sink()
+            if sheets_sink:
                 try:
-                    sheets_data = {
-                        'user_id': '', 'service_type': service, 'place': data.get('place'),
-                        'name': data.get('name'), 'phone': data.get('phone'), 'email': data.get('email'),
-                        'documents': '', 'notes': ''
-                    }
-                    if service == 'Education India':
-                        sheets_data['notes'] = f"Place: {data.get('education_place')} | Course: {data.get('course')}"
-                    elif service == 'Education Abroad':
-                        sheets_data['notes'] = f"Country: {data.get('education_country')}"
-                    elif service == 'Job Europe':
-                        sheets_data['notes'] = f"Job Type: {data.get('work')}"
-                    sheets_manager.save_lead(sheets_data)
-                except:
-                    pass  # Ignore all errors
+                    if not sheets_sink.submit(lead.sheet_data(lead_id)):
+                        logger.error(f"Lead could not be queued for Google Sheets: {lead.record['name']}")
+                except Exception as e:
+                    logger.error(f"Error queueing lead for Google Sheets: {e}")
             
             # ALWAYS return success after validation passes
-            response = json.dumps({'success': True, 'message': 'Lead submitted successfully'})
+            body = {'success': True, 'message': 'Lead submitted successfully', 'id': lead_id}
+            if idempotency_key:
+                get_idempotency_cache().complete(idempotency_key, 200, body)
+                self.idempotent_response_stored = True
+            response = json.dumps(body)
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             self.wfile.write(response.encode())
+            self.wfile.flush()
+            
+            # Deliver queued rows before the function can be frozen
+            if sheets_sink:
+                sheets_sink.flush(timeout=10)
             
         except Exception as e:
             # If validation passed but something else failed, still return success
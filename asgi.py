@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+asyncio (ASGI) front end for the lead API
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Serves /api/submit-lead and /api/health with the same validation, storage
+and Google Sheets code as server.py. A submission waits on the lead writer's
+commit future with asyncio.wrap_future instead of blocking a thread, so one
+process can hold thousands of in-flight submissions; the remaining blocking
+steps (index sync, outbox insert, shared idempotency store) run in the
+default executor. The site and the rest of the API are served by the WSGI
+app (wsgi.py).
+"""
+
+import json
+import time
+import asyncio
+import logging
+import functools
+
+import server
+from integrations.idempotency import MAX_KEY_LENGTH, REPLAY, IN_PROGRESS
+from integrations.admission import ADMITTED
+
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted for a single submission
+MAX_BODY_BYTES = 64 * 1024
+
+# Seconds to wait for the lead writer to commit a submission
+COMMIT_TIMEOUT = 10.0
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+async def _send_json(send, status, body, extra_headers=()):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            *CORS_HEADERS,
+            *extra_headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def _read_body(receive):
+    """Request body, or None if it is larger than MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def _idempotency(call, *args):
+    # The in-memory cache is cheap; a shared SQLite store is not
+    if server.idempotency.db_path:
+        return await _blocking(call, *args)
+    return call(*args)
+
+
+def _finish(lead, lead_data, duplicate_of, day, saved, started):
+    saved = server.lead_committed(day, saved)
+    server.STAGE_STORE.observe(time.perf_counter() - started)
+    return server.complete_submission(lead, lead_data, duplicate_of, saved)
+
+
+async def submit_lead(body):
+    """Process one submission; returns (body, status)"""
+    start = time.perf_counter()
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    parsed = time.perf_counter()
+    server.STAGE_PARSE.observe(parsed - start)
+    lead, lead_data, duplicate_of, response = server.prepare_submission(data)
+    validated = time.perf_counter()
+    server.STAGE_VALIDATE.observe(validated - parsed)
+    if response is not None:
+        server.STAGE_TOTAL.observe(validated - start)
+        return response
+
+    day = server.lead_day(lead_data)
+    try:
+        # Shielded so a timeout does not cancel the writer's future; the
+        # lead may still be committed along with the rest of its batch
+        saved = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(server.lead_writer.submit(day, lead_data))), COMMIT_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error waiting for lead commit: {e}")
+        saved = False
+    response = await _blocking(_finish, lead, lead_data, duplicate_of, day, saved, validated)
+    server.STAGE_TOTAL.observe(time.perf_counter() - start)
+    return response
+
+
+async def handle_submit(scope, receive, send):
+    headers = dict(scope['headers'])
+    # Shares the Flask app's limits; a full concurrency cap is rejected
+    # rather than queued, since waiting would block the event loop
+    client = scope.get('client')
+    forwarded_for = headers.get(b'x-forwarded-for', b'').decode('latin-1')
+    outcome, retry_after = server.admission.admit(
+        server.admission.client(client[0] if client else None, forwarded_for), wait=False)
+    if outcome != ADMITTED:
+        await _send_json(send, 429, {'error': 'Too many requests, please try again shortly'},
+                         [(b'retry-after', server.admission.retry_after_header(retry_after).encode())])
+        return
+    try:
+        await _submit(scope, receive, send, headers)
+    finally:
+        server.admission.release()
+
+
+async def _submit(scope, receive, send, headers):
+    key = headers.get(b'idempotency-key', b'').decode('latin-1')
+    if len(key) > MAX_KEY_LENGTH:
+        await _send_json(send, 400, {'error': 'Idempotency-Key is too long'})
+        return
+
+    if key:
+        # Same key space as the Flask view, so a retry may reach either
+        key = f"{scope['path']}:{key}"
+        outcome, stored = await _idempotency(server.idempotency.reserve, key)
+        if outcome == REPLAY:
+            await _send_json(send, stored[0], stored[1], [(b'idempotent-replayed', b'true')])
+            return
+        if outcome == IN_PROGRESS:
+            await _send_json(send, 409, {'error': 'A request with this Idempotency-Key is already in progress'})
+            return
+
+    try:
+        body = await _read_body(receive)
+        if body is None:
+            status, response = 413, {'error': 'Request body too large'}
+        else:
+            response, status = await submit_lead(body)
+    except Exception as e:
+        logger.error(f"Error processing lead submission: {e}")
+        status, response = 500, {'error': 'Internal server error', 'details': str(e)}
+
+    if key:
+        # Server errors are not remembered so the client can retry them
+        if status >= 500:
+            await _idempotency(server.idempotency.release, key)
+        else:
+            await _idempotency(server.idempotency.complete, key, status, response)
+    await _send_json(send, status, response)
+
+
+async def handle_health(scope, receive, send):
+    await _send_json(send, 200, await _blocking(server.health_status))
+
+
+async def handle_options(scope, receive, send):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            *CORS_HEADERS,
+            (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type, Idempotency-Key'),
+            (b'content-length', b'0'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+ROUTES = {
+    ('POST', '/api/submit-lead'): handle_submit,
+    ('GET', '/api/health'): handle_health,
+    ('OPTIONS', '/api/submit-lead'): handle_options,
+    ('OPTIONS', '/api/health'): handle_options,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            server.start_background_work()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await _blocking(server.drain_background_work)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        known_path = any(path == scope['path'] for _, path in ROUTES)
+        await _send_json(send, 405 if known_path else 404,
+                         {'error': 'Method not allowed' if known_path else 'Not found'})
+        return
+    await handler(scope, receive, send)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the gspread client used by GoogleSheetsManager
+Keeps rows in memory and adds configurable latency, quota errors, failures
+and outages, so the Sheets pipeline can be benchmarked without Google
+
+    from benchmarks.fake_sheets import FakeSheetsBackend
+    backend = FakeSheetsBackend(latency=0.2, quota_error_rate=0.1)
+    backend.install()   # before GoogleSheetsManager connects
+"""
+
+import os
+import json
+import time
+import base64
+import random
+import threading
+from typing import Dict, List, Optional
+
+
+class FakeAPIError(Exception):
+    """Raised the way gspread raises APIError, with an HTTP status code"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"APIError: [{code}]: {message}")
+        self.code = code
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter.upper()) - 64)
+    return index - 1
+
+
+def _parse_cell(ref: str):
+    """'H12' -> (11, 7); 'A' -> (None, 0)"""
+    letters = ''.join(c for c in ref if c.isalpha())
+    digits = ''.join(c for c in ref if c.isdigit())
+    return (int(digits) - 1 if digits else None), _column_index(letters)
+
+
+class FakeWorksheet:
+    """The subset of gspread.Worksheet that the integrations call"""
+
+    def __init__(self, backend: 'FakeSheetsBackend', title: str = 'Sheet1', sheet_id: int = 0):
+        self.backend = backend
+        self.title = title
+        self.id = sheet_id
+        self.rows: List[List] = []
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def row_values(self, row: int) -> List:
+        self.backend.call('read')
+        with self._lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col: int) -> List:
+        self.backend.call('read')
+        with self._lock:
+            return [r[col - 1] if len(r) >= col else '' for r in self.rows]
+
+    def get(self, range_name: str) -> List[List]:
+        self.backend.call('read')
+        start, _, end = range_name.partition(':')
+        first_row, _ = _parse_cell(start)
+        last_row, last_col = _parse_cell(end or start)
+        with self._lock:
+            rows = self.rows[first_row or 0:None if last_row is None else last_row + 1]
+            return [list(r[:last_col + 1]) for r in rows]
+
+    def get_all_values(self) -> List[List]:
+        self.backend.call('read')
+        with self._lock:
+            return [list(r) for r in self.rows]
+
+    def append_row(self, values: List, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values: List[List], **kwargs):
+        self.backend.call('write')
+        with self._lock:
+            self.rows.extend([list(v) for v in values])
+
+    def update(self, range_name, values=None, **kwargs):
+        self.backend.call('write')
+        with self._lock:
+            self._write(range_name, values if isinstance(values, list) else [[values]])
+
+    def batch_update(self, data: List[Dict], **kwargs):
+        self.backend.call('write')
+        with self._lock:
+            for entry in data:
+                self._write(entry['range'], entry['values'])
+
+    def _write(self, range_name: str, values: List[List]):
+        row, col = _parse_cell(range_name.split(':')[0])
+        for offset, row_values in enumerate(values):
+            index = (row or 0) + offset
+            while len(self.rows) <= index:
+                self.rows.append([])
+            target = self.rows[index]
+            while len(target) < col + len(row_values):
+                target.append('')
+            target[col:col + len(row_values)] = row_values
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend: 'FakeSheetsBackend', spreadsheet_id: str):
+        self.backend = backend
+        self.id = spreadsheet_id
+        self.title = f"Fake spreadsheet {spreadsheet_id}"
+        self.sheet1 = FakeWorksheet(backend)
+        self._worksheets = [self.sheet1]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.backend.call('read')
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.backend.call('read')
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise FakeAPIError(400, f"Worksheet {title!r} not found")
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self.backend.call('write')
+        worksheet = FakeWorksheet(self.backend, title, len(self._worksheets))
+        self._worksheets.append(worksheet)
+        return worksheet
+
+
+class FakeClient:
+    def __init__(self, backend: 'FakeSheetsBackend'):
+        self.backend = backend
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.backend.call('read')
+        return self.backend.spreadsheet(key)
+
+
+class FakeSheetsBackend:
+    """
+    In-memory Google Sheets with injected faults.
+
+    Every API call sleeps for latency (plus up to jitter), then fails with
+    HTTP 429 with probability quota_error_rate, or HTTP 500 with probability
+    failure_rate. Between outage_start and outage_start + outage_duration
+    seconds after install() every call fails with HTTP 503.
+    """
+
+    def __init__(self, latency: float = 0.15, jitter: float = 0.05, quota_error_rate: float = 0.0,
+                 failure_rate: float = 0.0, outage_start: float = None, outage_duration: float = 0.0,
+                 seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self.failure_rate = failure_rate
+        self.outage_start = outage_start
+        self.outage_duration = outage_duration
+        self._random = random.Random(seed)
+        self._spreadsheets: Dict[str, FakeSpreadsheet] = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.calls = {'read': 0, 'write': 0}
+        self.errors = {'quota': 0, 'failure': 0, 'outage': 0}
+
+    @classmethod
+    def from_env(cls, name: str = 'BENCH_SHEETS') -> Optional['FakeSheetsBackend']:
+        """Backend configured by a JSON object of constructor arguments, or None"""
+        config = os.getenv(name)
+        return cls(**json.loads(config)) if config else None
+
+    def spreadsheet(self, key: str) -> FakeSpreadsheet:
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = FakeSpreadsheet(self, key)
+            return self._spreadsheets[key]
+
+    def in_outage(self) -> bool:
+        if self.outage_start is None:
+            return False
+        elapsed = time.monotonic() - self.started
+        return self.outage_start <= elapsed < self.outage_start + self.outage_duration
+
+    def call(self, kind: str):
+        """Account for one API call, sleeping and raising as configured"""
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self.latency + self._random.random() * self.jitter
+            roll = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if self.in_outage():
+            self._error('outage', 503, 'The service is currently unavailable.')
+        if roll < self.quota_error_rate:
+            self._error('quota', 429, "Quota exceeded for quota metric 'Write requests'")
+        if roll < self.quota_error_rate + self.failure_rate:
+            self._error('failure', 500, 'Internal error encountered.')
+
+    def _error(self, kind: str, code: int, message: str):
+        with self._lock:
+            self.errors[kind] += 1
+        raise FakeAPIError(code, message)
+
+    def rows(self) -> int:
+        """Lead rows (excluding header rows) across all worksheets"""
+        with self._lock:
+            spreadsheets = list(self._spreadsheets.values())
+        total = 0
+        for spreadsheet in spreadsheets:
+            for worksheet in spreadsheet._worksheets:
+                total += sum(1 for row in worksheet.rows if row and row[0] != 'User ID')
+        return total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'calls': dict(self.calls), 'errors': dict(self.errors)}
+
+    def install(self, spreadsheet_id: str = 'bench-spreadsheet'):
+        """
+        Make GoogleSheetsManager connect to this backend
+
+        Sets placeholder credentials and a spreadsheet id in the environment
+        and replaces the shared gspread client, so the real manager, mirror,
+        scheduler and outbox all run against the fake.
+        """
+        from integrations import google_sheets
+
+        placeholder = {'client_email': 'bench@example.com', 'private_key_id': 'bench'}
+        os.environ['GOOGLE_CREDENTIALS_JSON_B64'] = base64.b64encode(json.dumps(placeholder).encode()).decode()
+        os.environ['GOOGLE_SPREADSHEET_ID'] = spreadsheet_id
+        client = FakeClient(self)
+        google_sheets._shared_client = lambda key, load_credentials: client
+        self.started = time.monotonic()
+        return self
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Load test for lead submissions against a local Google Sheets stand-in
+Replays realistic form payloads against server.py or the api/submit-lead.py
+handler, each run in its own process on a scratch lead store, and reports
+throughput, p50/p95/p99 latency and leads lost on the way to the store or
+to Google Sheets
+
+Usage: python benchmarks/load.py [scenario ...] [--requests 2000] [--concurrency 32]
+                                 [--json results.json] [--compare previous.json]
+       python benchmarks/load.py --list
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from integrations.lead_store import LeadStore
+
+# Each scenario is a list of steps; a step runs one or more target processes
+# sharing a lead store and Sheets outbox. 'sheets' configures the fake
+# backend (see benchmarks/fake_sheets.py) and 'env' the target process.
+SCENARIOS = {
+    'baseline': {
+        'description': 'server.py with a healthy Google Sheets',
+        'steps': [{'target': 'server'}],
+    },
+    'api-handler': {
+        'description': 'api/submit-lead.py, which flushes Sheets before returning',
+        'steps': [{'target': 'api'}],
+    },
+    'growing-store': {
+        'description': 'server.py on stores already holding 0, 20k and 100k leads',
+        'steps': [{'target': 'server', 'seed_leads': n} for n in (0, 20000, 100000)],
+    },
+    'sheets-outage': {
+        'description': 'Google Sheets fails every call for 6s mid-run, then recovers',
+        'steps': [{
+            'target': 'server',
+            'sheets': {'outage_start': 1.0, 'outage_duration': 6.0},
+            'env': {'SHEETS_BREAKER_RESET': '2'},
+        }],
+    },
+    'quota-errors': {
+        'description': '20% of Sheets calls fail with HTTP 429 and 5% with HTTP 500',
+        'steps': [{'target': 'server', 'sheets': {'quota_error_rate': 0.2, 'failure_rate': 0.05}}],
+    },
+    'concurrent-writers': {
+        'description': 'four server.py processes writing to one lead store and outbox',
+        'steps': [{'target': 'server', 'processes': 4}],
+    },
+}
+
+SERVICE_VALUES = {
+    'Education India': {
+        'education_place': ['Bangalore', 'Chennai', 'Kochi', 'Mangalore', 'Coimbatore'],
+        'course': ['Nursing', 'B.Tech', 'MBA', 'BBA', 'Pharmacy', 'Allied Health'],
+    },
+    'Education Abroad': {
+        'education_country': ['Germany', 'Canada', 'UK', 'Ireland', 'Australia', 'New Zealand'],
+    },
+    'Job Europe': {
+        'work': ['Truck Driver', 'Welder', 'Caregiver', 'Electrician', 'Warehouse Worker'],
+    },
+}
+FIRST_NAMES = ['Arjun', 'Anjali', 'Rahul', 'Fathima', 'Vishnu', 'Sneha', 'Mohammed', 'Aparna', 'Joel', 'Divya']
+LAST_NAMES = ['Nair', 'Menon', 'Thomas', 'Kumar', 'Pillai', 'Varghese', 'Rahman', 'Das', 'Joseph', 'Iyer']
+PLACES = ['Kochi', 'Thrissur', 'Kozhikode', 'Trivandrum', 'Kannur', 'Palakkad', 'Kollam', 'Kottayam']
+
+
+def make_payloads(count: int, seed: int = 1, duplicate_rate: float = 0.05,
+                  invalid_rate: float = 0.02, prefix: str = '') -> list:
+    """
+    Form submissions in the proportions the site sees: mostly new leads,
+    some people submitting twice, and some payloads missing a field
+    """
+    rng = random.Random(seed)
+    services = list(SERVICE_VALUES)
+    payloads = []
+    for i in range(count):
+        if payloads and rng.random() < duplicate_rate:
+            payloads.append(dict(rng.choice(payloads)))
+            continue
+        service = rng.choices(services, weights=(5, 3, 2))[0]
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        lead = {
+            'service': service,
+            'name': f"{first} {last}",
+            'phone': f"+91 9{rng.randrange(10**8, 10**9)}",
+            'email': f"{first}.{last}.{prefix}{i}@example.com".lower(),
+            'place': rng.choice(PLACES),
+        }
+        for field, values in SERVICE_VALUES[service].items():
+            lead[field] = rng.choice(values)
+        if rng.random() < invalid_rate:
+            lead[rng.choice(list(lead))] = ''
+        payloads.append(lead)
+    return payloads
+
+
+def seed_store(leads_dir: Path, count: int):
+    """Fill the store with history spread over the previous 60 days"""
+    if count <= 0:
+        return
+    store = LeadStore(leads_dir)
+    today = date.today()
+    batch = []
+    for i, payload in enumerate(make_payloads(count, seed=7, duplicate_rate=0, invalid_rate=0, prefix='seed')):
+        day = (today - timedelta(days=1 + i % 60)).strftime('%d_%m_%Y')
+        batch.append((day, {'id': f"seed{i}", **payload, 'timestamp': '10:00:00'}))
+        if len(batch) == 5000:
+            store.append_batch(batch)
+            batch = []
+    store.append_batch(batch)
+
+
+def count_stored(leads_dir: Path) -> int:
+    store = LeadStore(leads_dir)
+    return sum(1 for day in store.days() for _ in store.iter_lines(day))
+
+
+def count_outbox(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with sqlite3.connect(str(path)) as conn:
+        return conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))]
+
+
+# --- target process -------------------------------------------------------
+
+def serve(target: str, drain_timeout: float):
+    """
+    Run one target on an ephemeral port: print {"port": N}, serve until
+    stdin closes, drain queued work and print the Sheets backend's counters
+    """
+    from benchmarks.fake_sheets import FakeSheetsBackend
+
+    backend = FakeSheetsBackend.from_env()
+    if backend:
+        backend.install()
+
+    if target == 'server':
+        from werkzeug.serving import make_server
+        import server
+        server.start_background_work()
+        httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    else:
+        import importlib.util
+        from http.server import ThreadingHTTPServer
+        spec = importlib.util.spec_from_file_location('submit_lead', BASE_DIR / 'api' / 'submit-lead.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 128
+
+        httpd = Server(('127.0.0.1', 0), module.handler)
+
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(json.dumps({'port': httpd.server_port}), flush=True)
+    sys.stdin.read()
+    httpd.shutdown()
+
+    duplicates = 0
+    if target == 'server':
+        from integrations.lead_schema import SERVICES
+        # Drained once here, so rows delivered at exit are not missed below
+        atexit.unregister(server.drain_background_work)
+        server.drain_background_work(drain_timeout)
+        duplicates = sum(server.SUBMISSIONS.labels(service, 'duplicate').value for service in SERVICES)
+    else:
+        sink = module.get_sheets_sink()
+        if sink:
+            sink.close(drain_timeout)
+
+    print(json.dumps({
+        'sheet_rows': backend.rows() if backend else 0,
+        'sheets': backend.stats() if backend else None,
+        'duplicates': int(duplicates),
+    }), flush=True)
+
+
+# --- load generator -------------------------------------------------------
+
+def run_load(ports: list, payloads: list, concurrency: int, timeout: float) -> dict:
+    """Closed-loop load: each client sends its next payload as soon as the last returns"""
+    path = '/api/submit-lead'
+    bodies = [json.dumps(payload).encode('utf-8') for payload in payloads]
+    results = []
+    next_index = iter(range(len(bodies)))
+    lock = threading.Lock()
+
+    def client(port):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        local = []
+        for index in next_index:
+            start = time.perf_counter()
+            try:
+                conn.request('POST', path, body=bodies[index], headers={'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    conn.close()
+            except Exception:
+                conn.close()
+                status = 0
+            local.append((time.perf_counter() - start, status))
+        conn.close()
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(ports[i % len(ports)],)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, status in results if status)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(results),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(results) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+
+def run_step(step: dict, args, scratch: Path) -> dict:
+    leads_dir = scratch / 'leads'
+    outbox = scratch / 'sheets_outbox.db'
+    shutil.rmtree(leads_dir, ignore_errors=True)
+    for path in scratch.glob('sheets_outbox.db*'):
+        path.unlink()
+    seeded = step.get('seed_leads', 0)
+    seed_store(leads_dir, seeded)
+
+    sheets = {'latency': args.sheets_latency, 'seed': args.seed, **step.get('sheets', {})}
+    env = dict(os.environ)
+    for name in ('LEADS_API_TOKEN', 'IDEMPOTENCY_DB', 'GOOGLE_CREDENTIALS_JSON_B64'):
+        env.pop(name, None)
+    env.update({
+        'LEADS_DIR': str(leads_dir),
+        'SHEETS_OUTBOX': str(outbox),
+        'SHEETS_MAX_DELAY': '0.5',
+        'BENCH_SHEETS': json.dumps(sheets),
+        # Every simulated client shares one address; measure the pipeline,
+        # not the per-client rate limit
+        'ADMISSION_CLIENT_RATE': '0',
+        'ADMISSION_GLOBAL_RATE': '0',
+        **step.get('env', {}),
+    })
+
+    processes = []
+    ports = []
+    for i in range(step.get('processes', 1)):
+        log = open(scratch / f"target-{i}.log", 'w')
+        proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), '--serve', step['target'],
+             '--drain-timeout', str(args.drain_timeout)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log,
+            text=True, env=env, cwd=str(BASE_DIR)
+        )
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"{step['target']} failed to start, see {log.name}")
+        processes.append(proc)
+        ports.append(json.loads(line)['port'])
+
+    payloads = make_payloads(args.requests, seed=args.seed)
+    result = run_load(ports, payloads, args.concurrency, args.timeout)
+
+    reports = []
+    for proc in processes:
+        out, _ = proc.communicate('', timeout=args.drain_timeout + 60)
+        reports.append(json.loads(out.strip().splitlines()[-1]))
+
+    accepted = result['statuses'].get('200', 0)
+    duplicates = sum(r['duplicates'] for r in reports)
+    delivered = sum(r['sheet_rows'] for r in reports)
+    pending = count_outbox(outbox)
+    expected_sheets = accepted - duplicates
+    result.update({
+        'target': step['target'],
+        'processes': len(processes),
+        'seed_leads': seeded,
+        'sheets_config': sheets,
+        'sheets_delivered': delivered,
+        'sheets_pending': pending,
+        'lost_sheets': max(0, expected_sheets - delivered - pending),
+        'sheets_calls': [r['sheets'] for r in reports],
+    })
+    if step['target'] == 'server':
+        stored = count_stored(leads_dir) - seeded
+        result['stored'] = stored
+        result['lost_store'] = max(0, accepted - stored)
+    return result
+
+
+def print_row(name: str, r: dict):
+    lost = f"{r.get('lost_store', '-')}/{r['lost_sheets']}"
+    print(f"{name:<28}{r['throughput']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+          f"{r['requests'] - r['statuses'].get('200', 0):>8}{lost:>12}{r['sheets_pending']:>9}")
+
+
+def compare(results: dict, previous_path: str):
+    """Print throughput and p99 changes against an earlier results file"""
+    with open(previous_path) as f:
+        previous = json.load(f)['scenarios']
+    print(f"\n{'vs ' + previous_path:<28}{'req/s':>12}{'p99 ms':>12}")
+    for name, scenario in results.items():
+        for i, step in enumerate(scenario['steps']):
+            try:
+                before = previous[name]['steps'][i]
+            except (KeyError, IndexError):
+                continue
+            label = name if len(scenario['steps']) == 1 else f"{name}[{step.get('seed_leads', i)}]"
+
+            def change(key):
+                return f"{(step[key] - before[key]) / before[key] * 100:+.1f}%" if before[key] else '-'
+            print(f"{label:<28}{change('throughput'):>12}{change('p99_ms'):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', default=['baseline'])
+    parser.add_argument('--list', action='store_true', help='List scenarios and exit')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--sheets-latency', type=float, default=0.15, help='Seconds per fake Sheets call')
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help='Seconds each target may spend delivering queued Sheets rows at shutdown')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--compare', help='Compare with results from an earlier --json run')
+    parser.add_argument('--serve', choices=('server', 'api'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.drain_timeout)
+        return
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<20}{scenario['description']}")
+        return
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)} (see --list)")
+
+    scratch = Path(tempfile.mkdtemp(prefix='dreamaxis-load-'))
+    results = {}
+    print(f"{'scenario':<28}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'non-200':>8}"
+          f"{'lost st/sh':>12}{'pending':>9}")
+    try:
+        for name in args.scenarios:
+            steps = SCENARIOS[name]['steps']
+            results[name] = {'description': SCENARIOS[name]['description'], 'steps': []}
+            for i, step in enumerate(steps):
+                r = run_step(step, args, scratch)
+                results[name]['steps'].append(r)
+                print_row(name if len(steps) == 1 else f"{name}[{step.get('seed_leads', i)}]", r)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'settings': {k: getattr(args, k) for k in ('requests', 'concurrency', 'sheets_latency', 'seed')},
+                'scenarios': results,
+            }, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Dream Axis entry points
+Reports module import time and first-request time for each entry point,
+each measured in a fresh interpreter
+
+Usage: python benchmarks/startup.py [--runs 5] [--json results.json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+ENTRY_POINTS = {
+    'server.py': ('server.py', 'GET', '/api/health'),
+    'api/health.py': ('api/health.py', 'GET', '/api/health'),
+    'api/submit-lead.py': ('api/submit-lead.py', 'POST', '/api/submit-lead'),
+}
+
+SAMPLE_LEAD = {
+    'service': 'Job Europe', 'work': 'Truck Driver', 'name': 'Benchmark Lead',
+    'phone': '+91 90000 00000', 'email': 'bench@example.com', 'place': 'Kochi'
+}
+
+# Runs inside the child interpreter; prints one JSON line with timings
+CHILD = r'''
+import io, json, sys, time, importlib.util
+path, method, url, body = sys.argv[1:5]
+sys.path.insert(0, BASE)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('entry', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+
+if hasattr(module, 'app'):
+    client = module.app.test_client()
+    if method == 'POST':
+        client.post(url, data=body, content_type='application/json')
+    else:
+        client.get(url)
+else:
+    raw = body.encode()
+    request = (f"{method} {url} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(raw)}\r\n\r\n").encode() + raw
+
+    class FakeSocket:
+        def makefile(self, mode, *args, **kwargs):
+            return io.BytesIO(request) if 'r' in mode else io.BytesIO()
+        def sendall(self, data):
+            pass
+
+    module.handler(FakeSocket(), ('127.0.0.1', 0), None)
+first_request = time.perf_counter()
+
+heavy = sorted(m for m in ('gspread', 'google.auth', 'flask', 'sqlite3') if m in sys.modules)
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (first_request - imported) * 1000,
+    'heavy_modules': heavy,
+}))
+'''
+
+
+def measure(entry: str, runs: int, env: dict) -> dict:
+    path, method, url = ENTRY_POINTS[entry]
+    body = json.dumps(SAMPLE_LEAD) if method == 'POST' else ''
+    code = f"BASE = {str(BASE_DIR)!r}\n" + CHILD
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', code, str(BASE_DIR / path), method, url, body],
+            capture_output=True, text=True, env=env, cwd=str(BASE_DIR)
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"{entry} failed:\n{out.stderr}")
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        'import_ms': statistics.median(s['import_ms'] for s in samples),
+        'first_request_ms': statistics.median(s['first_request_ms'] for s in samples),
+        'heavy_modules': samples[-1]['heavy_modules'],
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('entries', nargs='*', default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Keep the benchmark from writing into the real lead store
+    scratch = tempfile.mkdtemp(prefix='dreamaxis-bench-')
+    env.setdefault('LEADS_DIR', os.path.join(scratch, 'leads'))
+    env.setdefault('SHEETS_OUTBOX', os.path.join(scratch, 'sheets_outbox.db'))
+
+    results = {}
+    print(f"{'entry point':<22}{'import ms':>12}{'first req ms':>14}  heavy modules loaded")
+    for entry in args.entries:
+        r = results[entry] = measure(entry, args.runs, env)
+        print(f"{entry:<22}{r['import_ms']:>12.1f}{r['first_request_ms']:>14.1f}  {', '.join(r['heavy_modules']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
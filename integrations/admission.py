@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Admission control for the lead submission endpoints
+Turns away floods from one client (or everyone at once) with a 429 before a
+request costs any parsing, storage or Google Sheets work
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from integrations.metrics import REGISTRY
+from integrations.sheets_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of admit() / check_rate()
+ADMITTED = 'admitted'
+CLIENT_RATE = 'client_rate'
+GLOBAL_RATE = 'global_rate'
+BUSY = 'busy'
+
+# Seconds between summaries of rejected requests in the log
+LOG_INTERVAL = 60.0
+
+# Rate-limited clients named in the log per LOG_INTERVAL; the rest only
+# show up in the summary's counts
+MAX_LOGGED_CLIENTS = 20
+
+REJECTED = REGISTRY.counter('admission_rejected_total', 'Submissions turned away with 429, by reason', ['reason'])
+
+
+def client_ip(remote_addr: Optional[str], forwarded_for: Optional[str], trusted_proxies: int = 0) -> str:
+    """
+    Address of the client, looking through trusted_proxies reverse proxies
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so only the last trusted_proxies entries can be
+    believed; anything to their left may have been sent by the client.
+    """
+    if trusted_proxies > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return remote_addr or 'unknown'
+
+
+class AdmissionController:
+    """
+    Per-client and global token buckets plus a concurrency cap.
+
+    Each client address gets a bucket of client_burst tokens refilled at
+    client_rate per minute. Buckets live in an LRU map of at most
+    max_clients entries, and are dropped once idle long enough to have
+    refilled, since a full bucket is the same as a new one. A global
+    bucket (global_rate per second) bounds the total. Admitted requests
+    then take one of max_concurrent slots, waiting up to queue_timeout in a
+    queue of at most max_queue requests. A rate of 0 disables that check,
+    as does max_concurrent=0 for the cap.
+    """
+
+    def __init__(self, client_rate: float = 30.0, client_burst: float = 10.0,
+                 global_rate: float = 200.0, global_burst: float = None,
+                 max_concurrent: int = 64, max_queue: int = 128, queue_timeout: float = 0.5,
+                 max_clients: int = 10000, trusted_proxies: int = 0):
+        self.client_rate = client_rate / 60.0
+        self.client_burst = max(1.0, float(client_burst))
+        self.global_bucket = (TokenBucket(global_rate * 60.0, global_burst if global_burst else global_rate)
+                              if global_rate > 0 else None)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max(1, int(max_clients))
+        self.trusted_proxies = trusted_proxies
+        # Seconds after which an idle client's bucket is full again
+        self._idle_expiry = self.client_burst / self.client_rate if self.client_rate > 0 else 0.0
+
+        self._clients: "OrderedDict[str, list]" = OrderedDict()
+        self._clients_lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._slots = threading.Condition()
+        self._rejected: Dict[str, int] = {}
+        self._limited_clients = set()
+        self._logged_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls, trusted_proxies: int = 0) -> 'AdmissionController':
+        """Controller configured through ADMISSION_* environment variables"""
+        global_burst = os.getenv('ADMISSION_GLOBAL_BURST')
+        controller = cls(
+            client_rate=float(os.getenv('ADMISSION_CLIENT_RATE', 30)),
+            client_burst=float(os.getenv('ADMISSION_CLIENT_BURST', 10)),
+            global_rate=float(os.getenv('ADMISSION_GLOBAL_RATE', 200)),
+            global_burst=float(global_burst) if global_burst else None,
+            max_concurrent=int(os.getenv('ADMISSION_MAX_CONCURRENT', 64)),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 128)),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.5)),
+            max_clients=int(os.getenv('ADMISSION_MAX_CLIENTS', 10000)),
+            trusted_proxies=int(os.getenv('ADMISSION_TRUSTED_PROXIES', trusted_proxies)),
+        )
+        logger.info(f"Admission control: {controller.client_rate * 60:g}/min per client "
+                    f"(burst {controller.client_burst:g}), "
+                    f"{os.getenv('ADMISSION_GLOBAL_RATE', 200)}/s overall, "
+                    f"{controller.max_concurrent or 'unlimited'} concurrent")
+        return controller
+
+    def client(self, remote_addr: Optional[str], forwarded_for: Optional[str]) -> str:
+        """Key a request is rate limited by"""
+        return client_ip(remote_addr, forwarded_for, self.trusted_proxies)
+
+    def _take_client_token(self, client: str, now: float) -> float:
+        """Take a token from a client's bucket; returns 0, or seconds until one is available"""
+        with self._clients_lock:
+            state = self._clients.get(client)
+            if state is None:
+                # Least recently seen first: drop clients whose buckets have
+                # refilled (they would start full anyway), then any over the bound
+                clients = self._clients
+                while clients and (len(clients) >= self.max_clients or
+                                   now - next(iter(clients.values()))[1] >= self._idle_expiry):
+                    clients.popitem(last=False)
+                state = self._clients[client] = [self.client_burst, now]
+            else:
+                self._clients.move_to_end(client)
+                state[0] = min(self.client_burst, state[0] + (now - state[1]) * self.client_rate)
+                state[1] = now
+            if state[0] >= 1.0:
+                state[0] -= 1.0
+                return 0.0
+            return (1.0 - state[0]) / self.client_rate
+
+    def check_rate(self, client: str) -> Tuple[str, float]:
+        """
+        Apply the client and global token buckets
+
+        Returns:
+            tuple: (ADMITTED, 0) or (CLIENT_RATE / GLOBAL_RATE, seconds to wait)
+        """
+        if self.client_rate > 0:
+            wait = self._take_client_token(client, time.monotonic())
+            if wait:
+                return self._reject(CLIENT_RATE, client, wait)
+        if self.global_bucket and not self.global_bucket.try_acquire():
+            return self._reject(GLOBAL_RATE, client, self.global_bucket.wait_time())
+        return ADMITTED, 0.0
+
+    def acquire(self, wait: bool = True) -> bool:
+        """Take a concurrency slot, queueing for up to queue_timeout if allowed"""
+        if not self.max_concurrent:
+            return True
+        with self._slots:
+            if self._active < self.max_concurrent:
+                self._active += 1
+                return True
+            if not wait or self._waiting >= self.max_queue or self.queue_timeout <= 0:
+                return False
+            self._waiting += 1
+            try:
+                if self._slots.wait_for(lambda: self._active < self.max_concurrent, self.queue_timeout):
+                    self._active += 1
+                    return True
+                return False
+            finally:
+                self._waiting -= 1
+
+    def release(self):
+        """Give back a slot taken by acquire() or admit()"""
+        if not self.max_concurrent:
+            return
+        with self._slots:
+            self._active -= 1
+            self._slots.notify()
+
+    def admit(self, client: str, wait: bool = True) -> Tuple[str, float]:
+        """
+        Rate-check a request and take a concurrency slot for it
+
+        Args:
+            client: Key from client()
+            wait: Queue for a slot when all are taken (event loops pass False)
+
+        Returns:
+            tuple: (ADMITTED, 0), after which release() must be called, or
+                   (reason, seconds the client should wait before retrying)
+        """
+        outcome, retry_after = self.check_rate(client)
+        if outcome != ADMITTED:
+            return outcome, retry_after
+        if not self.acquire(wait):
+            return self._reject(BUSY, client, 1.0)
+        return ADMITTED, 0.0
+
+    def _reject(self, reason: str, client: str, retry_after: float) -> Tuple[str, float]:
+        REJECTED.labels(reason).inc()
+        now = time.monotonic()
+        with self._clients_lock:
+            self._rejected[reason] = self._rejected.get(reason, 0) + 1
+            first_for_client = (reason == CLIENT_RATE and client not in self._limited_clients and
+                                len(self._limited_clients) < MAX_LOGGED_CLIENTS)
+            if first_for_client:
+                self._limited_clients.add(client)
+            summary = None
+            if now - self._logged_at >= LOG_INTERVAL:
+                summary, self._rejected = self._rejected, {}
+                self._limited_clients = set()
+                self._logged_at = now
+        if first_for_client:
+            logger.warning(f"Rate limiting submissions from {client}")
+        if summary:
+            logger.warning("Rejected submissions in the last minute: " +
+                           ', '.join(f"{reason}={count}" for reason, count in sorted(summary.items())))
+        return reason, retry_after
+
+    @staticmethod
+    def retry_after_header(retry_after: float) -> str:
+        """Retry-After value in whole seconds (at least 1)"""
+        return str(max(1, math.ceil(retry_after)))
+
+    def stats(self) -> Dict:
+        with self._slots:
+            active, waiting = self._active, self._waiting
+        with self._clients_lock:
+            clients = len(self._clients)
+        return {'active': active, 'waiting': waiting, 'clients_tracked': clients}
@@ -5,43 +5,164 @@ Automatically saves collected lead data to Google Sheets
 """
 
 import os
+import json
+import time
 import logging
 import base64
-import tempfile
-from typing import Dict, List, Optional
-from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
-from google.auth.exceptions import GoogleAuthError
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, timezone
 from pathlib import Path
 
+from integrations.sheets_mirror import SheetMirror
+from integrations.sheets_rollover import WorksheetRollover
+
+# gspread and google-auth are imported on first connection, so importing
+# this module stays cheap for entry points that may never talk to Google
+
 logger = logging.getLogger(__name__)
 
-def _credentials_path_from_env_or_file(default_path: str) -> str:
+# Seconds to wait before retrying a failed lazy connection
+INIT_RETRY_INTERVAL = 30.0
+
+# Refresh access tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300.0
+
+# Keep-alive connection pool and timeout for the shared Sheets session
+HTTP_POOL_SIZE = int(os.getenv('SHEETS_HTTP_POOL_SIZE', 10))
+HTTP_TIMEOUT = float(os.getenv('SHEETS_HTTP_TIMEOUT', 30))
+
+# Seconds a cached sheet mirror is served before checking for new rows
+MIRROR_TTL = float(os.getenv('SHEETS_MIRROR_TTL', 30))
+
+# Header row of every leads worksheet
+SHEET_HEADERS = [
+    'User ID',
+    'Timestamp',
+    'Service Type',
+    'Place/Location',
+    'Full Name',
+    'Phone Number',
+    'Email',
+    'Status',
+    'Documents',
+    'Notes'
+]
+
+# Status is in column H (8th column)
+STATUS_COLUMN = 'H'
+STATUS_INDEX = 7
+
+# (spreadsheet id, worksheet id) pairs whose headers are known to be present
+_checked_headers = set()
+
+# One authorised client per service account, shared by every manager in the process
+_clients: Dict[Tuple, Tuple[int, object]] = {}
+_clients_lock = threading.Lock()
+
+def _credentials_info_from_env() -> Optional[Dict]:
     """
-    Resolve a credentials file path. Supports base64-encoded credentials via
-    GOOGLE_CREDENTIALS_JSON_B64. Falls back to a provided file path.
+    Decode base64-encoded service account credentials from
+    GOOGLE_CREDENTIALS_JSON_B64. Returns None if unset or invalid.
     """
     b64_creds = os.getenv("GOOGLE_CREDENTIALS_JSON_B64")
     if b64_creds:
         try:
-            decoded = base64.b64decode(b64_creds).decode("utf-8")
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-            tmp.write(decoded.encode("utf-8"))
-            tmp.close()
-            return tmp.name
+            return json.loads(base64.b64decode(b64_creds).decode("utf-8"))
         except Exception as e:
             logger.error(f"Error decoding GOOGLE_CREDENTIALS_JSON_B64: {e}")
-            return default_path
-    return default_path
+    return None
+
+
+class _TokenRefresher(threading.Thread):
+    """Refreshes an access token ahead of expiry so API calls never wait on it"""
+
+    def __init__(self, credentials):
+        super().__init__(name='sheets-token-refresh', daemon=True)
+        import requests
+        from google.auth.transport.requests import Request
+        self.credentials = credentials
+        self._request = Request(requests.Session())
+
+    def expires_in(self) -> float:
+        expiry = self.credentials.expiry  # naive UTC, as google-auth stores it
+        if expiry is None:
+            return 0.0
+        return (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    def refresh(self):
+        self.credentials.refresh(self._request)
+
+    def run(self):
+        while True:
+            try:
+                if not self.credentials.valid or self.expires_in() < TOKEN_REFRESH_MARGIN:
+                    self.refresh()
+                delay = max(30.0, self.expires_in() - TOKEN_REFRESH_MARGIN)
+            except Exception as e:
+                logger.error(f"Error refreshing Google access token: {e}")
+                delay = 30.0
+            time.sleep(delay)
+
+
+def _shared_client(key: Tuple, load_credentials: Callable):
+    """
+    Return the process-wide gspread client for a service account, creating
+    it with a pooled keep-alive session and a background token refresher
+    """
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry and entry[0] == os.getpid():
+            return entry[1]
+
+        import gspread
+        from requests.adapters import HTTPAdapter
+        from google.auth.transport.requests import AuthorizedSession
+
+        credentials = load_credentials()
+        refresher = _TokenRefresher(credentials)
+        refresher.refresh()
+        refresher.start()
+
+        session = AuthorizedSession(credentials)
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+        client = gspread.Client(auth=credentials, session=session)
+        client.set_timeout(HTTP_TIMEOUT)
+
+        _clients[key] = (os.getpid(), client)
+        return client
+
+
+def _coalesce_status_ranges(by_row: Dict[int, str]) -> List[Dict]:
+    """Group status writes on consecutive rows into batch_update ranges"""
+    ranges = []
+    start = previous = None
+    values = []
+    for row_number in sorted(by_row):
+        if previous is not None and row_number == previous + 1:
+            values.append([by_row[row_number]])
+        else:
+            if values:
+                ranges.append({'range': f'{STATUS_COLUMN}{start}:{STATUS_COLUMN}{previous}', 'values': values})
+            start, values = row_number, [[by_row[row_number]]]
+        previous = row_number
+    if values:
+        ranges.append({'range': f'{STATUS_COLUMN}{start}:{STATUS_COLUMN}{previous}', 'values': values})
+    return ranges
 
 
 class GoogleSheetsManager:
-    def __init__(self, credentials_file: str = None, spreadsheet_id: str = None):
+    def __init__(self, credentials_file: str = None, spreadsheet_id: str = None, lazy: bool = False):
         self.sheets_client = None
         self.spreadsheet = None
         self.worksheet = None
+        self.mirror = None
+        self.rollover = None
+        self._mirrors: Dict[str, SheetMirror] = {}
         self.initialized = False
+        self._init_lock = threading.Lock()
+        self._last_init_attempt = 0.0
+        self._pid = None
         
         # Google Sheets API scope
         self.scope = [
@@ -49,43 +170,84 @@ class GoogleSheetsManager:
             'https://www.googleapis.com/auth/drive'
         ]
         
-        # Use provided paths or defaults, with env override for credentials
+        # Use provided paths or defaults, with in-memory env credentials taking priority
         if credentials_file is None:
             credentials_file = Path(__file__).parent.parent / 'google_credentials.json'
-        resolved_creds = _credentials_path_from_env_or_file(str(credentials_file))
+        self.credentials_info = _credentials_info_from_env()
 
         if spreadsheet_id is None:
             spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
         
-        self.credentials_file = resolved_creds
+        self.credentials_file = str(credentials_file)
         self.spreadsheet_id = spreadsheet_id
         
-        self._initialize_sheets()
+        # Lazy managers connect on first use instead of at construction
+        if not lazy:
+            self._initialize_sheets()
+    
+    def ensure_initialized(self) -> bool:
+        """Connect on first use, retrying failed attempts at most every INIT_RETRY_INTERVAL"""
+        if self.initialized and self._pid == os.getpid():
+            return True
+        with self._init_lock:
+            if self.initialized and self._pid == os.getpid():
+                return True
+            if self.initialized:
+                # Forked from the process that connected: its HTTP session
+                # and token refresher belong to the parent, so reconnect
+                self.initialized = False
+                self._last_init_attempt = 0.0
+            if self._last_init_attempt and time.monotonic() - self._last_init_attempt < INIT_RETRY_INTERVAL:
+                return False
+            self._initialize_sheets()
+        return self.initialized
     
     def _initialize_sheets(self):
         """Initialize Google Sheets connection"""
+        self._last_init_attempt = time.monotonic()
+        
+        # Check if credentials are available
+        if not self.credentials_info and not os.path.exists(self.credentials_file):
+            logger.warning(f"Google credentials file not found at {self.credentials_file}. Google Sheets integration disabled.")
+            return
+        
+        if not self.spreadsheet_id:
+            logger.warning("GOOGLE_SPREADSHEET_ID not found in environment. Google Sheets integration disabled.")
+            return
+        
         try:
-            # Check if credentials file exists
-            if not os.path.exists(self.credentials_file):
-                logger.warning(f"Google credentials file not found at {self.credentials_file}. Google Sheets integration disabled.")
-                return
-            
-            if not self.spreadsheet_id:
-                logger.warning("GOOGLE_SPREADSHEET_ID not found in environment. Google Sheets integration disabled.")
-                return
-            
-            # Load credentials
-            creds = Credentials.from_service_account_file(self.credentials_file, scopes=self.scope)
-            self.sheets_client = gspread.authorize(creds)
+            from google.oauth2.service_account import Credentials
+            from google.auth.exceptions import GoogleAuthError
+        except ImportError as e:
+            logger.warning(f"Google Sheets libraries not installed: {e}. Google Sheets integration disabled.")
+            return
+        
+        try:
+            # Load credentials from memory when provided, otherwise from file
+            if self.credentials_info:
+                key = ('info', self.credentials_info.get('client_email'),
+                       self.credentials_info.get('private_key_id'), *self.scope)
+                load = lambda: Credentials.from_service_account_info(self.credentials_info, scopes=self.scope)
+            else:
+                key = ('file', os.path.abspath(self.credentials_file), *self.scope)
+                load = lambda: Credentials.from_service_account_file(self.credentials_file, scopes=self.scope)
+            self.sheets_client = _shared_client(key, load)
             
             # Open spreadsheet
             self.spreadsheet = self.sheets_client.open_by_key(self.spreadsheet_id)
             self.worksheet = self.spreadsheet.sheet1
+            self._mirrors = {}
+            self.mirror = self._mirror_for(self.worksheet)
+            
+            # New rows go to monthly (or N-row) tabs unless SHEETS_ROLLOVER=none;
+            # sheet1 is still read for leads written before that
+            self.rollover = WorksheetRollover.from_env(self.spreadsheet, SHEET_HEADERS, legacy=self.worksheet)
             
             # Ensure headers exist
             self._ensure_headers()
             
             self.initialized = True
+            self._pid = os.getpid()
             logger.info(f"Google Sheets integration initialized successfully! Spreadsheet: {self.spreadsheet.title}")
             
         except GoogleAuthError as e:
@@ -97,33 +259,40 @@ class GoogleSheetsManager:
         """Ensure the worksheet has proper headers"""
         if not self.worksheet:
             return
+        
+        # Headers only need checking once per worksheet per process
+        key = (self.spreadsheet_id, getattr(self.worksheet, 'id', None))
+        if key in _checked_headers:
+            return
             
         try:
             # Get existing headers
             headers = self.worksheet.row_values(1)
             
-            # Define required headers
-            required_headers = [
-                'User ID',
-                'Timestamp',
-                'Service Type',
-                'Place/Location',
-                'Full Name',
-                'Phone Number',
-                'Email',
-                'Status',
-                'Documents',
-                'Notes'
-            ]
-            
             # Check if headers need to be added
-            if not headers or len(headers) < len(required_headers):
-                self.worksheet.update('A1:J1', [required_headers])
+            if not headers or len(headers) < len(SHEET_HEADERS):
+                self.worksheet.update('A1:J1', [SHEET_HEADERS])
                 logger.info("Google Sheets headers updated")
+            _checked_headers.add(key)
                 
         except Exception as e:
             logger.error(f"Error ensuring headers: {e}")
     
+    def build_row(self, lead_data: Dict) -> List:
+        """Build the sheet row for a lead, stamped with the current time"""
+        return [
+            lead_data.get('user_id', ''),                  # User ID
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # Timestamp
+            lead_data.get('service_type', ''),             # Service Type
+            lead_data.get('place', ''),                    # Place/Location
+            lead_data.get('name', ''),                     # Full Name
+            lead_data.get('phone', ''),                    # Phone Number
+            lead_data.get('email', ''),                    # Email
+            'New Lead',                                    # Status
+            lead_data.get('documents', ''),                # Documents
+            lead_data.get('notes', '')                     # Notes
+        ]
+    
     def save_lead(self, lead_data: Dict) -> bool:
         """
         Save lead data to Google Sheets
@@ -134,27 +303,17 @@ class GoogleSheetsManager:
         Returns:
             bool: True if saved successfully, False otherwise
         """
-        if not self.initialized or not self.worksheet:
+        if not self.ensure_initialized() or not self.worksheet:
             logger.warning("Google Sheets not initialized. Cannot save lead.")
             return False
         
         try:
-            # Prepare row data
-            row_data = [
-                lead_data.get('user_id', ''),                  # User ID
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # Timestamp
-                lead_data.get('service_type', ''),             # Service Type
-                lead_data.get('place', ''),                    # Place/Location
-                lead_data.get('name', ''),                     # Full Name
-                lead_data.get('phone', ''),                    # Phone Number
-                lead_data.get('email', ''),                    # Email
-                'New Lead',                                    # Status
-                lead_data.get('documents', ''),                # Documents
-                lead_data.get('notes', '')                     # Notes
-            ]
-            
-            # Append row to worksheet
-            self.worksheet.append_row(row_data)
+            # Append row to the active worksheet
+            row = self.build_row(lead_data)
+            for worksheet, _ in self._assign([row]):
+                worksheet.append_row(row)
+                if self.rollover:
+                    self.rollover.record(worksheet, 1)
             
             logger.info(f"Lead saved to Google Sheets: {lead_data.get('name', 'Unknown')}")
             return True
@@ -163,34 +322,171 @@ class GoogleSheetsManager:
             logger.error(f"Error saving lead to Google Sheets: {e}")
             return False
     
-    def get_all_leads(self) -> List[Dict]:
-        """Get all leads from Google Sheets"""
-        if not self.initialized or not self.worksheet:
+    def append_rows(self, rows: List[List]) -> bool:
+        """
+        Append several prepared rows with a single API call
+        
+        Args:
+            rows: Rows built with build_row
+            
+        Returns:
+            bool: True if saved successfully, False otherwise
+        """
+        if not rows:
+            return True
+        if not self.ensure_initialized() or not self.worksheet:
+            logger.warning("Google Sheets not initialized. Cannot save leads.")
+            return False
+        
+        try:
+            for worksheet, worksheet_rows in self._assign(rows):
+                worksheet.append_rows(worksheet_rows)
+                if self.rollover:
+                    self.rollover.record(worksheet, len(worksheet_rows))
+            logger.info(f"Saved {len(rows)} leads to Google Sheets")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error saving {len(rows)} leads to Google Sheets: {e}")
+            return False
+    
+    def _assign(self, rows: List[List]) -> List[Tuple[object, List[List]]]:
+        """(worksheet, rows) pairs saying where each row is appended"""
+        if self.rollover:
+            return self.rollover.assign(rows)
+        return [(self.worksheet, rows)]
+    
+    def _mirror_for(self, worksheet) -> SheetMirror:
+        """The cached mirror of a worksheet, created on first use"""
+        mirror = self._mirrors.get(worksheet.title)
+        if mirror is None:
+            mirror = self._mirrors.setdefault(worksheet.title, SheetMirror(worksheet, ttl=MIRROR_TTL))
+        return mirror
+    
+    def worksheets(self, date_from: date = None, date_to: date = None) -> List:
+        """Worksheets that can hold leads from an inclusive day range, oldest first"""
+        if self.rollover:
+            return self.rollover.worksheets(date_from, date_to)
+        return [self.worksheet]
+    
+    def get_all_leads(self, refresh: bool = False, date_from: date = None, date_to: date = None) -> List[Dict]:
+        """
+        Get leads from the local sheet mirrors
+        
+        Only the worksheets that can hold leads from the requested days are
+        read, and from each only rows added since the last refresh are
+        downloaded, once its mirror is older than SHEETS_MIRROR_TTL (or
+        refresh=True).
+        
+        Args:
+            refresh: Check the sheet for new rows now
+            date_from / date_to: Inclusive day range of the lead timestamps
+        """
+        if not self.ensure_initialized() or not self.mirror:
             return []
         
         try:
-            # Get all data
-            all_data = self.worksheet.get_all_records()
-            return all_data
+            leads = []
+            for worksheet in self.worksheets(date_from, date_to):
+                mirror = self._mirror_for(worksheet)
+                if refresh:
+                    mirror.refresh(force=True)
+                leads.extend(mirror.records())
+            if date_from or date_to:
+                first = date_from.isoformat() if date_from else ''
+                last = date_to.isoformat() if date_to else '9999'
+                leads = [lead for lead in leads if first <= str(lead.get('Timestamp', ''))[:10] <= last]
+            return leads
             
         except Exception as e:
             logger.error(f"Error getting leads from Google Sheets: {e}")
             return []
     
+    def invalidate_cache(self, full: bool = False):
+        """Make the next read check the sheet; full=True re-downloads everything"""
+        for mirror in list(self._mirrors.values()):
+            mirror.invalidate(full=full)
+    
     def update_lead_status(self, row_number: int, status: str) -> bool:
-        """Update lead status in Google Sheets"""
-        if not self.initialized or not self.worksheet:
+        """Update lead status in Google Sheets by row of sheet1 (see update_leads_status)"""
+        if not self.ensure_initialized() or not self.worksheet:
             return False
         
         try:
-            # Status is in column H (8th column)
-            cell = f'H{row_number + 2}'  # +2 because row 1 is headers and sheets are 1-indexed
+            cell = f'{STATUS_COLUMN}{row_number + 2}'  # +2 because row 1 is headers and sheets are 1-indexed
             self.worksheet.update(cell, status)
             return True
             
         except Exception as e:
             logger.error(f"Error updating lead status: {e}")
             return False
+    
+    def _update_statuses_in(self, worksheet, wanted: Dict[str, str], verify: bool) -> Dict[str, int]:
+        """Write statuses for the leads found in one worksheet; returns id -> row"""
+        mirror = self._mirror_for(worksheet)
+        mirror.refresh(force=any(mirror.row_for(i) is None for i in wanted))
+        if verify and any(mirror.row_for(i) is not None for i in wanted):
+            if not mirror.matches_ids(worksheet.col_values(1)[1:]):
+                logger.info(f"Lead rows have moved in {worksheet.title!r}, rebuilding index")
+                mirror.invalidate(full=True)
+                mirror.refresh(force=True)
+        
+        found = {}
+        by_row = {}
+        for lead_id, status in wanted.items():
+            row_number = mirror.row_for(lead_id)
+            if row_number is not None:
+                found[lead_id] = row_number
+                by_row[row_number] = status
+        
+        ranges = _coalesce_status_ranges(by_row)
+        if ranges:
+            worksheet.batch_update(ranges)
+            for row_number, status in by_row.items():
+                mirror.set_cell(row_number, STATUS_INDEX, status)
+            logger.info(f"Updated status of {len(by_row)} leads with {len(ranges)} ranges")
+        return found
+    
+    def update_leads_status(self, updates: Iterable[Tuple[str, str]], verify: bool = True) -> Dict[str, bool]:
+        """
+        Update the status of many leads with one batch_update per worksheet
+        
+        Lead ids are resolved to rows through the mirrors' id indexes, so
+        callers do not need row numbers. Worksheets are searched newest
+        first, since recent leads are the ones whose status changes. With
+        verify=True the id column of each worksheet written to is read first
+        (one small read) and its index rebuilt if rows have moved. Runs of
+        consecutive rows are written as one range holding each row's own
+        status, whether or not the statuses match.
+        
+        Args:
+            updates: (lead id, status) pairs; the last status for an id wins
+            verify: Check the id column before writing
+            
+        Returns:
+            dict: lead id -> True if updated, False if unknown or failed
+        """
+        wanted = {str(lead_id): status for lead_id, status in updates}
+        if not wanted:
+            return {}
+        if not self.ensure_initialized() or not self.mirror:
+            return {lead_id: False for lead_id in wanted}
+        
+        results = {lead_id: False for lead_id in wanted}
+        remaining = dict(wanted)
+        try:
+            for worksheet in reversed(self.worksheets()):
+                for lead_id in self._update_statuses_in(worksheet, remaining, verify):
+                    results[lead_id] = True
+                    del remaining[lead_id]
+                if not remaining:
+                    break
+            return results
+            
+        except Exception as e:
+            # Worksheets already written keep their True results
+            logger.error(f"Error updating lead statuses: {e}")
+            return results
 
 # Global instance will be created by server.py
 sheets_manager = None
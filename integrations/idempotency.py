@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Idempotency-Key support for the lead submission endpoints
+Remembers the first response for each key so client retries are replayed
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+# Result of reserve(): replay a stored response, process the request, or
+# refuse because another request with the same key is still running
+REPLAY = 'replay'
+PROCEED = 'proceed'
+IN_PROGRESS = 'in_progress'
+
+
+class IdempotencyCache:
+    """
+    Bounded in-memory TTL/LRU map from idempotency key to the first
+    response, optionally backed by a SQLite file shared by every worker.
+
+    reserve() either returns the stored response, claims the key for the
+    caller, or reports that another request holds it. The caller then calls
+    complete() with its response, or release() if it should not be kept
+    (e.g. a server error the client is expected to retry).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0,
+                 db_path: Optional[str] = None, in_progress_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.db_path = str(db_path) if db_path else None
+
+        # key -> (expires_at, status or None while in progress, body)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[int], Optional[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.replays = 0
+
+        if self.db_path:
+            conn = self._db()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS idempotency ('
+                'key TEXT PRIMARY KEY, status INTEGER, body TEXT, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at)')
+
+    @classmethod
+    def from_env(cls, default_db: Optional[str] = None) -> 'IdempotencyCache':
+        """Build a cache configured through IDEMPOTENCY_* environment variables"""
+        return cls(
+            max_entries=int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000)),
+            ttl=float(os.getenv('IDEMPOTENCY_TTL', 86400)),
+            db_path=os.getenv('IDEMPOTENCY_DB', default_db) or None,
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _remember(self, key: str, expires_at: float, status: Optional[int], body: Optional[Dict]):
+        self._entries[key] = (expires_at, status, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def reserve(self, key: str) -> Tuple[str, Optional[Tuple[int, Dict]]]:
+        """
+        Look up a key and claim it if unseen
+
+        Returns:
+            tuple: (REPLAY, (status, body)), (PROCEED, None) or (IN_PROGRESS, None)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                if entry[1] is None:
+                    return IN_PROGRESS, None
+                self.replays += 1
+                return REPLAY, (entry[1], entry[2])
+
+            if not self.db_path:
+                self._remember(key, now + self.in_progress_ttl, None, None)
+                return PROCEED, None
+
+        try:
+            return self._reserve_shared(key, now)
+        except Exception as e:
+            # The shared store is an optimisation; fall back to local only
+            logger.error(f"Idempotency store error: {e}")
+            with self._lock:
+                self._remember(key, now + self.in_progress_ttl, None, None)
+            return PROCEED, None
+
+    def _reserve_shared(self, key: str, now: float):
+        conn = self._db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT status, body, expires_at FROM idempotency WHERE key = ?', (key,)).fetchone()
+            if row and row[2] > now:
+                conn.execute('COMMIT')
+                status, body, expires_at = row
+                if status is None:
+                    return IN_PROGRESS, None
+                body = json.loads(body)
+                with self._lock:
+                    self._remember(key, expires_at, status, body)
+                    self.replays += 1
+                return REPLAY, (status, body)
+            conn.execute(
+                'INSERT OR REPLACE INTO idempotency (key, status, body, expires_at) VALUES (?, NULL, NULL, ?)',
+                (key, now + self.in_progress_ttl)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._remember(key, now + self.in_progress_ttl, None, None)
+        return PROCEED, None
+
+    def complete(self, key: str, status: int, body: Dict):
+        """Store the response for a reserved key"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, status, body)
+        if self.db_path:
+            try:
+                conn = self._db()
+                conn.execute(
+                    'INSERT OR REPLACE INTO idempotency (key, status, body, expires_at) VALUES (?, ?, ?, ?)',
+                    (key, status, json.dumps(body), expires_at)
+                )
+                # Expired keys are cleared lazily alongside normal writes
+                conn.execute('DELETE FROM idempotency WHERE expires_at < ?', (time.time(),))
+            except Exception as e:
+                logger.error(f"Error storing idempotent response: {e}")
+
+    def release(self, key: str):
+        """Forget a reserved key so the client can retry it"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.db_path:
+            try:
+                self._db().execute('DELETE FROM idempotency WHERE key = ? AND status IS NULL', (key,))
+            except Exception as e:
+                logger.error(f"Error releasing idempotency key: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'replays': self.replays}
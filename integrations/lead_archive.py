@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Compressed, block-indexed archive files for closed lead days
+Holds a month of day segments byte for byte in compressed blocks; readers
+mmap the file and decompress only the blocks of the days they read
+
+Usage: python -m integrations.lead_archive compact [--keep-days 30]
+       python -m integrations.lead_archive export 2026-09-14 [...]
+       python -m integrations.lead_archive info
+"""
+
+import os
+import json
+import lzma
+import mmap
+import uuid
+import zlib
+import struct
+from pathlib import Path
+from typing import Dict, Iterator
+
+ARCHIVE_SUFFIX = '.leadarc'
+MAGIC = b'LEADARC1'
+# Index offset, index length and MAGIC again at the end of the file
+TRAILER = struct.Struct('<QQ8s')
+
+# Uncompressed bytes per block; blocks end on a line and never span days
+BLOCK_BYTES = 256 * 1024
+
+CODEC_LZMA = 'lzma'
+CODEC_ZLIB = 'zlib'
+CODECS = {
+    CODEC_LZMA: (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    CODEC_ZLIB: (lambda data: zlib.compress(data, 9), zlib.decompress),
+}
+
+
+class ArchiveError(Exception):
+    """An archive file is missing, truncated or not an archive"""
+
+
+class LeadArchive:
+    """
+    Read-only view of one archive file.
+
+    The file is memory-mapped and only its index (a small compressed JSON
+    trailer) is decoded on open. Each day's entry lists its blocks as
+    (file offset, compressed length, offset within the day, raw length),
+    where the offset within the day is the byte offset the data had in the
+    day's segment, so offsets handed out by LeadStore.read_from stay valid
+    after a day is archived.
+
+    Layout: MAGIC, compressed blocks, compressed JSON index, TRAILER.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise ArchiveError(f"Cannot open archive {self.path}: {e}")
+        try:
+            if len(self._map) < len(MAGIC) + TRAILER.size or self._map[:len(MAGIC)] != MAGIC:
+                raise ArchiveError(f"{self.path} is not a lead archive")
+            index_offset, index_length, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+            if magic != MAGIC or index_offset + index_length > len(self._map) - TRAILER.size:
+                raise ArchiveError(f"{self.path} is truncated")
+            index = json.loads(zlib.decompress(self._map[index_offset:index_offset + index_length]))
+        except ArchiveError:
+            self._map.close()
+            raise
+        except Exception as e:
+            self._map.close()
+            raise ArchiveError(f"Unreadable archive index in {self.path}: {e}")
+        self.id: str = index['id']
+        self.codec: str = index['codec']
+        self.days: Dict[str, Dict] = index['days']
+        self._decompress = CODECS[self.codec][1]
+
+    def __contains__(self, day: str) -> bool:
+        return day in self.days
+
+    def size(self, day: str) -> int:
+        """Bytes of segment data held for a day"""
+        return self.days[day]['size']
+
+    def count(self, day: str) -> int:
+        """Lines held for a day"""
+        return self.days[day]['count']
+
+    def raw_block(self, offset: int, length: int) -> bytes:
+        return self._map[offset:offset + length]
+
+    def read(self, day: str, offset: int = 0) -> bytes:
+        """Segment data for a day from offset on, decompressing only the blocks that hold it"""
+        chunks = []
+        for file_offset, length, start, raw_length in self.days[day]['blocks']:
+            if start + raw_length <= offset:
+                continue
+            data = self._decompress(self._map[file_offset:file_offset + length])
+            chunks.append(data[offset - start:] if start < offset else data)
+        return b''.join(chunks)
+
+    def iter_lines(self, day: str) -> Iterator[bytes]:
+        """Yield a day's lines one block at a time"""
+        for file_offset, length, _, _ in self.days[day]['blocks']:
+            data = self._decompress(self._map[file_offset:file_offset + length])
+            for line in data.splitlines(keepends=True):
+                if line.strip():
+                    yield line
+
+    def close(self):
+        self._map.close()
+
+
+class ArchiveWriter:
+    """
+    Writes a new archive file, block by block.
+
+    Days are added from segment data (add_day) or copied from an existing
+    archive without recompressing (copy_day); finish() writes the index and
+    returns the archive's id.
+    """
+
+    def __init__(self, path, codec: str = CODEC_LZMA, block_bytes: int = BLOCK_BYTES):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown archive codec {codec!r}, expected one of {tuple(CODECS)}")
+        self.path = Path(path)
+        self.codec = codec
+        self.block_bytes = block_bytes
+        self.days: Dict[str, Dict] = {}
+        self._compress = CODECS[codec][0]
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+
+    def _entry(self, day: str) -> Dict:
+        return self.days.setdefault(day, {'size': 0, 'count': 0, 'blocks': []})
+
+    def _write_block(self, entry: Dict, compressed: bytes, raw_length: int):
+        entry['blocks'].append([self._file.tell(), len(compressed), entry['size'], raw_length])
+        entry['size'] += raw_length
+        self._file.write(compressed)
+
+    def add_day(self, day: str, data: bytes):
+        """Append segment data for a day (after anything already added for it)"""
+        entry = self._entry(day)
+        # A torn final line is never read from a segment, and no reader's
+        # offset is past it, so it is left out
+        data = data[:data.rfind(b'\n') + 1]
+        pos = 0
+        while pos < len(data):
+            end = pos + self.block_bytes
+            if end >= len(data):
+                end = len(data)
+            else:
+                newline = data.rfind(b'\n', pos, end)
+                end = newline + 1 if newline >= pos else data.index(b'\n', end) + 1
+            block = data[pos:end]
+            entry['count'] += sum(1 for line in block.splitlines() if line.strip())
+            self._write_block(entry, self._compress(block), len(block))
+            pos = end
+
+    def copy_day(self, archive: LeadArchive, day: str):
+        """Copy a day from another archive, reusing its compressed blocks when the codec matches"""
+        if archive.codec != self.codec:
+            self.add_day(day, archive.read(day))
+            return
+        entry = self._entry(day)
+        for file_offset, length, _, raw_length in archive.days[day]['blocks']:
+            self._write_block(entry, archive.raw_block(file_offset, length), raw_length)
+        entry['count'] += archive.count(day)
+
+    def finish(self) -> str:
+        """Write the index and trailer, flush to disk and return the archive id"""
+        archive_id = uuid.uuid4().hex
+        index = zlib.compress(json.dumps({
+            'id': archive_id,
+            'codec': self.codec,
+            'days': self.days,
+        }, separators=(',', ':')).encode('utf-8'), 9)
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(TRAILER.pack(index_offset, len(index), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        return archive_id
+
+    def abort(self):
+        self._file.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    import sys
+    import argparse
+    from datetime import date, timedelta
+    from integrations.lead_store import LeadStore
+    from integrations.lead_export import export_leads, FORMAT_JSON
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--leads-dir', default=os.getenv('LEADS_DIR', Path(__file__).parent.parent / 'leads'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    compact = commands.add_parser('compact', help='archive days older than --keep-days')
+    compact.add_argument('--keep-days', type=int, default=int(os.getenv('LEADS_ARCHIVE_AFTER_DAYS', 30)))
+    compact.add_argument('--codec', choices=tuple(CODECS), default=CODEC_LZMA)
+    export = commands.add_parser('export', help='print days as JSON in the daily_leads.json layout')
+    export.add_argument('days', nargs='+', help='dd_mm_YYYY or YYYY-MM-DD')
+    commands.add_parser('info', help='show live and archived days and their sizes')
+    args = parser.parse_args()
+
+    store = LeadStore(args.leads_dir)
+    if args.command == 'compact':
+        archived = store.compact(date.today() - timedelta(days=args.keep_days), codec=args.codec)
+        print(f"Archived {archived} days")
+    elif args.command == 'export':
+        for day in args.days:
+            for chunk in export_leads(store, FORMAT_JSON, date_from=day, date_to=day):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.write(b'\n')
+    else:
+        archived = set(store.archived_days())
+        live = [day for day in store.days() if day not in archived]
+        print(f"{len(live)} live days, {len(archived)} archived days, {store.size_bytes()} bytes on disk")
+        for path in sorted(store.archive_dir.glob(f"*{ARCHIVE_SUFFIX}")):
+            archive = LeadArchive(path)
+            raw = sum(entry['size'] for entry in archive.days.values())
+            leads = sum(entry['count'] for entry in archive.days.values())
+            print(f"  {path.name}: {len(archive.days)} days, {leads} leads, "
+                  f"{raw} bytes in {path.stat().st_size} ({archive.codec})")
+            archive.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Streaming readers for bulk lead uploads
+Turn a JSON array, NDJSON or CSV request body into records one at a time,
+so an upload of any size is processed in bounded memory
+"""
+
+import io
+import csv
+import json
+import codecs
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+
+# Content types accepted for each format
+CONTENT_TYPES = {
+    'application/json': FORMAT_JSON,
+    'application/x-ndjson': FORMAT_NDJSON,
+    'application/ndjson': FORMAT_NDJSON,
+    'application/jsonl': FORMAT_NDJSON,
+    'application/x-jsonlines': FORMAT_NDJSON,
+    'text/csv': FORMAT_CSV,
+}
+
+FORMATS = (FORMAT_JSON, FORMAT_NDJSON, FORMAT_CSV)
+
+CHUNK_SIZE = 64 * 1024
+
+# Largest single record accepted; bigger ones are reported as errors
+MAX_RECORD_BYTES = 64 * 1024
+
+
+_DELIMITERS = frozenset(',] \t\r\n')
+
+
+class BulkFormatError(ValueError):
+    """The body cannot be read any further (e.g. a broken JSON array)"""
+
+
+# Each item is the record, or a per-record error message
+Record = Union[Dict, str]
+
+
+def detect_format(content_type: str, requested: str = None) -> str:
+    """Format from an explicit ?format= value or the Content-Type header"""
+    if requested:
+        return requested if requested in FORMATS else ''
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPES.get(mimetype, '')
+
+
+def _chunks(stream, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(data)
+        if text:
+            yield text
+
+
+def iter_json_array(stream) -> Iterator[Record]:
+    """
+    Records of a top-level JSON array, decoded element by element
+
+    Raises:
+        BulkFormatError: if the body is not a well-formed array
+    """
+    decoder = json.JSONDecoder()
+    chunks = _chunks(stream)
+    buffer = ''
+    pos = 0
+    consumed = 0
+    eof = False
+    started = False
+
+    def more() -> bool:
+        nonlocal buffer, pos, consumed, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        consumed += pos
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos >= len(buffer):
+            if eof or not more():
+                raise BulkFormatError('Unexpected end of JSON array')
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise BulkFormatError('Body must be a JSON array')
+            started = True
+            pos += 1
+            expect_value = True
+            continue
+        if char == ']':
+            return
+        if not expect_value:
+            if char != ',':
+                raise BulkFormatError(f'Expected "," in JSON array at character {consumed + pos}')
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            value, end = None, -1
+        # A value touching the end of the buffer may be cut short, and a
+        # number may parse as a prefix of itself ("4." of "4.5"), so read on
+        # until the value is followed by a delimiter
+        cut_short = end < 0 or end >= len(buffer) or (
+            buffer[end] not in _DELIMITERS and not isinstance(value, (dict, list, str)))
+        if cut_short and not eof:
+            if len(buffer) - pos > MAX_RECORD_BYTES:
+                raise BulkFormatError(f'Record larger than {MAX_RECORD_BYTES} bytes')
+            more()
+            continue
+        if end < 0:
+            raise BulkFormatError(f'Invalid JSON in array at character {consumed + pos}')
+        pos = end
+        expect_value = False
+        yield value
+
+
+def iter_ndjson(stream) -> Iterator[Record]:
+    """One record per non-blank line; bad lines become per-record errors"""
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    while True:
+        line = reader.readline(MAX_RECORD_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_RECORD_BYTES and not line.endswith('\n'):
+            # Skip the rest of the oversized line
+            while line and not line.endswith('\n'):
+                line = reader.readline(CHUNK_SIZE)
+            yield f'Record larger than {MAX_RECORD_BYTES} bytes'
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield f'Invalid JSON: {e}'
+
+
+def iter_csv(stream) -> Iterator[Record]:
+    """Rows of a CSV file with a header row naming the lead fields"""
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        for row in csv.DictReader(reader):
+            # Columns beyond the header end up under None
+            row.pop(None, None)
+            yield row
+    except csv.Error as e:
+        raise BulkFormatError(f'Invalid CSV: {e}')
+
+
+READERS = {
+    FORMAT_JSON: iter_json_array,
+    FORMAT_NDJSON: iter_ndjson,
+    FORMAT_CSV: iter_csv,
+}
+
+
+def iter_records(stream, fmt: str) -> Iterator[Union[Record, BulkFormatError]]:
+    """
+    Records of the body in the given format
+
+    A BulkFormatError is yielded (not raised) as the last item when the body
+    cannot be read further, so records decoded before it are not lost
+    """
+    try:
+        yield from READERS[fmt](stream)
+    except BulkFormatError as e:
+        yield e
+
+
+def batched(records: Iterable, size: int) -> Iterator[List[Tuple[int, Record]]]:
+    """(index, record) pairs in lists of up to size"""
+    numbered = enumerate(records)
+    while True:
+        batch = list(islice(numbered, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Duplicate lead detection for Dream Axis Lead Collection Website
+Recognises repeat submissions by phone or email for the same service
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, Optional
+from datetime import datetime
+
+from integrations.lead_store import DAY_FORMAT
+from integrations.lead_index import normalize_email, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# What to do with a duplicate: keep it locally tagged with duplicate_of,
+# or merge it into the original by not storing it at all. A merge is a drop:
+# the original lead is left as it was, and fields that differ in the repeat
+# submission are discarded with it.
+ACTION_TAG = 'tag'
+ACTION_MERGE = 'merge'
+
+_ID_BYTES = 16
+_EMPTY_ID = bytes(_ID_BYTES)
+
+
+def _hash_key(kind: str, value: str, service: str) -> int:
+    digest = hashlib.blake2b(f"{kind}:{value}|{service}".encode('utf-8'), digest_size=8).digest()
+    # 0 marks an empty slot
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _id_to_bytes(lead_id) -> bytes:
+    try:
+        return bytes.fromhex(str(lead_id))[:_ID_BYTES].ljust(_ID_BYTES, b'\0')
+    except ValueError:
+        return _EMPTY_ID
+
+
+class _CompactTable:
+    """
+    Open-addressing hash table from a 64-bit key to (timestamp, lead id),
+    stored in flat arrays at 28 bytes per slot
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = 1 << max(10, (capacity - 1).bit_length())
+        self.mask = capacity - 1
+        self.keys = array('Q', bytes(8 * capacity))
+        self.stamps = array('I', bytes(4 * capacity))
+        self.ids = bytearray(_ID_BYTES * capacity)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return self.mask + 1
+
+    def _slot(self, key: int) -> int:
+        keys, mask = self.keys, self.mask
+        i = key & mask
+        while keys[i] and keys[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def get(self, key: int):
+        i = self._slot(key)
+        if not self.keys[i]:
+            return None
+        return self.stamps[i], bytes(self.ids[i * _ID_BYTES:(i + 1) * _ID_BYTES])
+
+    def put(self, key: int, stamp: int, lead_id: bytes):
+        i = self._slot(key)
+        if not self.keys[i]:
+            self.keys[i] = key
+            self.size += 1
+        self.stamps[i] = stamp
+        self.ids[i * _ID_BYTES:(i + 1) * _ID_BYTES] = lead_id
+
+    def expire(self, key: int):
+        """Mark a key's entry as older than any window; the slot stays in the probe chain"""
+        i = self._slot(key)
+        if self.keys[i]:
+            self.stamps[i] = 0
+
+    def items(self):
+        for i, key in enumerate(self.keys):
+            if key:
+                yield key, self.stamps[i], bytes(self.ids[i * _ID_BYTES:(i + 1) * _ID_BYTES])
+
+
+class _BloomFilter:
+    """Bit-array pre-screen; a miss proves the key was never added"""
+
+    def __init__(self, bits: int, hashes: int = 4):
+        self.bits = max(64, bits)
+        self.hashes = hashes
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, key: int):
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key: int):
+        for p in self._positions(key):
+            self.array[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class DedupIndex:
+    """
+    Remembers (phone, service) and (email, service) for every lead seen in
+    the last window_seconds.
+
+    Keys are 64-bit hashes in a compact open-addressing table, so memory
+    stays around 60 bytes per live key and lookups are constant time. When
+    the table fills up it is rebuilt without expired keys, which keeps its
+    size bounded by the number of leads inside the window. An optional bloom
+    filter answers most first-time submissions without probing the table.
+    """
+
+    def __init__(self, window_seconds: float = 7 * 86400, use_bloom: bool = True,
+                 capacity: int = 1 << 16):
+        self.window = int(window_seconds)
+        self.use_bloom = use_bloom
+        self._table = _CompactTable(capacity)
+        self._bloom = _BloomFilter(self._table.capacity * 8) if use_bloom else None
+        self._lock = threading.Lock()
+        self._day_starts: Dict[str, Optional[int]] = {}
+        self.duplicates = 0
+
+    def _keys(self, lead: Dict):
+        service = lead.get('service', '') or ''
+        phone = normalize_phone(lead.get('phone'))
+        email = normalize_email(lead.get('email'))
+        if phone:
+            yield _hash_key('p', phone, service)
+        if email:
+            yield _hash_key('e', email, service)
+
+    def _find(self, key: int, now: int) -> Optional[bytes]:
+        if self._bloom is not None and key not in self._bloom:
+            return None
+        entry = self._table.get(key)
+        if entry and now - entry[0] < self.window:
+            return entry[1]
+        return None
+
+    def _put(self, key: int, stamp: int, lead_id: bytes):
+        if (self._table.size + 1) * 10 > self._table.capacity * 7:
+            self._rebuild(int(time.time()))
+        self._table.put(key, stamp, lead_id)
+        if self._bloom is not None:
+            self._bloom.add(key)
+
+    def _rebuild(self, now: int):
+        live = [(k, s, i) for k, s, i in self._table.items() if now - s < self.window]
+        table = _CompactTable(max(len(live) * 2, 1024))
+        bloom = _BloomFilter(table.capacity * 8) if self.use_bloom else None
+        for key, stamp, lead_id in live:
+            table.put(key, stamp, lead_id)
+            if bloom is not None:
+                bloom.add(key)
+        self._table, self._bloom = table, bloom
+        logger.info(f"Dedup index rebuilt: {len(live)} live keys, capacity {table.capacity}")
+
+    def claim(self, lead: Dict, now: float = None) -> Optional[str]:
+        """
+        Check a new submission and record it if it is not a duplicate
+
+        Returns:
+            str: id of the earlier lead it duplicates ('' if that lead has
+                 no id), or None if the submission is new
+        """
+        now = int(now if now is not None else time.time())
+        keys = list(self._keys(lead))
+        with self._lock:
+            for key in keys:
+                original = self._find(key, now)
+                if original is not None:
+                    self.duplicates += 1
+                    return original.hex() if original != _EMPTY_ID else ''
+            lead_id = _id_to_bytes(lead.get('id', ''))
+            for key in keys:
+                self._put(key, now, lead_id)
+        return None
+
+    def release(self, lead: Dict):
+        """
+        Forget the keys claim() recorded for a lead that was then not stored,
+        so a retry of the same submission is not taken as its duplicate
+        """
+        lead_id = _id_to_bytes(lead.get('id', ''))
+        with self._lock:
+            for key in self._keys(lead):
+                entry = self._table.get(key)
+                # Keys since claimed by another lead are left alone
+                if entry and entry[1] == lead_id:
+                    self._table.expire(key)
+
+    def _day_start(self, day: str) -> Optional[int]:
+        if day not in self._day_starts:
+            try:
+                self._day_starts[day] = int(datetime.strptime(day, DAY_FORMAT).timestamp())
+            except ValueError:
+                self._day_starts[day] = None
+        return self._day_starts[day]
+
+    def observe(self, day: str, lead: Dict):
+        """Record a stored lead (at startup, or written by another worker)"""
+        day_start = self._day_start(day)
+        now = int(time.time())
+        if day_start is None or now - day_start >= self.window + 86400:
+            return
+        try:
+            hours, minutes, seconds = (int(part) for part in str(lead.get('timestamp', '0:0:0')).split(':'))
+            stamp = day_start + hours * 3600 + minutes * 60 + seconds
+        except ValueError:
+            stamp = day_start
+        if now - stamp >= self.window:
+            return
+        lead_id = _id_to_bytes(lead.get('id', ''))
+        with self._lock:
+            for key in self._keys(lead):
+                # Keep the first lead seen as the original
+                if self._find(key, now) is None:
+                    self._put(key, stamp, lead_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'keys': len(self._table),
+                'capacity': self._table.capacity,
+                'duplicates': self.duplicates,
+                'window_seconds': self.window,
+            }
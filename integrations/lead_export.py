@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Streaming export of stored leads as CSV, NDJSON or JSON
+Reads the lead store one day segment and one line at a time, so memory use
+does not depend on how much history is exported
+"""
+
+import io
+import csv
+import json
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from integrations.lead_store import LeadStore
+from integrations.lead_index import parse_day
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_JSON = 'json'
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_NDJSON, FORMAT_JSON)
+
+MIMETYPES = {
+    FORMAT_CSV: 'text/csv',
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_JSON: 'application/json',
+}
+
+CSV_COLUMNS = (
+    'day', 'timestamp', 'id', 'service', 'name', 'phone', 'email', 'place',
+    'education_place', 'course', 'education_country', 'work', 'duplicate_of',
+)
+
+# Output is handed to the server in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+
+def export_days(store: LeadStore, date_from: str = None, date_to: str = None) -> List[str]:
+    """Stored days within an inclusive range (dd_mm_YYYY or YYYY-MM-DD bounds)"""
+    start = parse_day(date_from) if date_from else None
+    end = parse_day(date_to) if date_to else None
+    days = []
+    for day in store.days():
+        parsed = parse_day(day)
+        if parsed is None or (start and parsed < start) or (end and parsed > end):
+            continue
+        days.append(day)
+    return days
+
+
+def _lines(store: LeadStore, days: Iterable[str], service: Optional[str]) -> Iterator[tuple]:
+    """(day, raw line, decoded lead or None) for each lead to export"""
+    # The service as it appears inside a stored record
+    needle = json.dumps(service, ensure_ascii=False)[1:-1].encode('utf-8') if service else None
+    for day in days:
+        for line in store.iter_lines(day):
+            if service is None:
+                yield day, line, None
+                continue
+            # Most lines of other services are skipped without decoding
+            if needle not in line:
+                continue
+            try:
+                lead = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(lead, dict) and lead.get('service') == service:
+                yield day, line, lead
+
+
+def iter_ndjson(store: LeadStore, days: Iterable[str], service: str = None) -> Iterator[bytes]:
+    """One JSON object per lead, with its day added as the first key"""
+    for day, line, lead in _lines(store, days, service):
+        # Lines are spliced in as stored, so unreadable ones (such as a
+        # record torn by a crash) are dropped first
+        if lead is None:
+            try:
+                lead = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(lead, dict):
+                continue
+        # Records are stored as JSON objects, so the day is spliced in
+        # rather than re-encoding every line
+        if line.startswith(b'{}'):
+            yield b'{"day":"' + day.encode() + b'"}\n'
+        else:
+            yield b'{"day":"' + day.encode() + b'",' + line[1:]
+
+
+def iter_json(store: LeadStore, days: Iterable[str], service: str = None) -> Iterator[bytes]:
+    """One JSON object of {"dd_mm_YYYY": [leads]}, the layout of daily_leads.json"""
+    yield b'{'
+    current = None
+    for day, line, lead in _lines(store, days, service):
+        # Lines are spliced in as stored, so unreadable ones are dropped first
+        if lead is None:
+            try:
+                lead = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(lead, dict):
+                continue
+        if day != current:
+            yield (b'' if current is None else b'],') + json.dumps(day).encode() + b':['
+            current = day
+        else:
+            yield b','
+        yield line.rstrip(b'\r\n')
+    yield b'}' if current is None else b']}'
+
+
+def iter_csv(store: LeadStore, days: Iterable[str], service: str = None) -> Iterator[bytes]:
+    """A header row, then one row per lead in CSV_COLUMNS order"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue().encode('utf-8')
+    for day, line, lead in _lines(store, days, service):
+        if lead is None:
+            try:
+                lead = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(lead, dict):
+                continue
+        lead['day'] = day
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([lead.get(column, '') for column in CSV_COLUMNS])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def coalesce(chunks: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Join small chunks into ones of about size bytes; the first goes out at once"""
+    pending = []
+    pending_size = 0
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            yield chunk
+            continue
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= size:
+            yield b''.join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a chunk stream as one gzip member, flushing after every chunk"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_leads(store: LeadStore, fmt: str, date_from: str = None, date_to: str = None,
+                 service: str = None, compress: bool = False) -> Iterator[bytes]:
+    """
+    Stream leads in the given format
+
+    Args:
+        store: Lead store to read
+        fmt: 'csv', 'ndjson' or 'json'
+        date_from / date_to: Inclusive day range
+        service: Only export leads for this service
+        compress: gzip the output
+
+    Returns:
+        Iterator of byte chunks
+    """
+    days = export_days(store, date_from, date_to)
+    rows = {FORMAT_CSV: iter_csv, FORMAT_NDJSON: iter_ndjson, FORMAT_JSON: iter_json}[fmt](store, days, service)
+    chunks = coalesce(rows)
+    return gzipped(chunks) if compress else chunks
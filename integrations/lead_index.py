@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+In-memory secondary indexes over the lead store
+Answers lookups by day, service, phone, email and place without scanning
+"""
+
+import re
+import time
+import heapq
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, date, timedelta
+
+from integrations.lead_store import LeadStore, DAY_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Fields that can be queried, in the order they are kept per lead
+INDEXED_FIELDS = ('day', 'service', 'phone', 'email', 'place')
+
+# How often to look for new day segments written by other processes
+DAY_SCAN_INTERVAL = 1.0
+
+# Segments older than this many days are closed and never re-read
+OPEN_DAYS = 1
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(phone) -> str:
+    """Digits only, reduced to the last 10 so +91 prefixes match local numbers"""
+    digits = _NON_DIGITS.sub('', str(phone or ''))
+    return digits[-10:] if len(digits) > 10 else digits
+
+
+def normalize_email(email) -> str:
+    return str(email or '').strip().lower()
+
+
+def normalize_text(value) -> str:
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def parse_day(value: str) -> Optional[date]:
+    """Accept dd_mm_YYYY (store keys) or YYYY-MM-DD (query strings)"""
+    for fmt in (DAY_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def lead_keys(day: str, lead: Dict) -> Tuple[str, str, str, str, str]:
+    """Normalised values of INDEXED_FIELDS for a lead"""
+    return (
+        day,
+        lead.get('service', '') or '',
+        normalize_phone(lead.get('phone')),
+        normalize_email(lead.get('email')),
+        normalize_text(lead.get('place')),
+    )
+
+
+class LeadIndex:
+    """
+    Secondary indexes over every lead in a LeadStore.
+
+    Each lead gets a sequence number in load order; every index maps a
+    normalised value to an ascending list of sequence numbers, so a query
+    walks only the shortest matching list and pages with a cursor by
+    bisecting it. The index tails the store's segment files, which picks up
+    this process's submissions and those of other workers alike.
+
+    Callables in listeners are invoked with (day, lead) for every lead as
+    it is indexed, so other in-memory views can follow the same stream.
+    """
+
+    def __init__(self, store: LeadStore):
+        self.store = store
+        self.leads: List[Dict] = []
+        self.keys: List[Tuple] = []
+        self._postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+        self._offsets: Dict[str, int] = {}
+        self._days_by_date: List[Tuple[date, str]] = []
+        self._days_scanned_at = 0.0
+        self._lock = threading.RLock()
+        self.listeners: List[Callable[[str, Dict], None]] = []
+
+    def rebuild(self):
+        """Index every stored lead from scratch"""
+        start = time.perf_counter()
+        with self._lock:
+            self.leads = []
+            self.keys = []
+            self._postings = {field: {} for field in INDEXED_FIELDS}
+            self._offsets = {}
+            self._days_by_date = []
+            self._days_scanned_at = 0.0
+            self.sync()
+        logger.info(f"Indexed {len(self.leads)} leads in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def sync(self, day: str = None):
+        """
+        Index records appended since the last sync
+
+        With a day, only that segment is checked (cheap enough to call after
+        every submission). Otherwise the open segments (today and yesterday)
+        are checked, and new segments are looked for once per
+        DAY_SCAN_INTERVAL.
+        """
+        with self._lock:
+            if day is not None:
+                days = [day]
+            else:
+                now = time.monotonic()
+                if now - self._days_scanned_at >= DAY_SCAN_INTERVAL:
+                    self._days_scanned_at = now
+                    days = [d for d in self.store.days() if d not in self._offsets]
+                else:
+                    days = []
+                oldest_open = date.today() - timedelta(days=OPEN_DAYS)
+                days += [d for parsed, d in reversed(self._days_by_date) if parsed >= oldest_open]
+            for segment_day in days:
+                leads, offset = self.store.read_from(segment_day, self._offsets.get(segment_day, 0))
+                self._offsets[segment_day] = offset
+                for lead in leads:
+                    self._add(segment_day, lead)
+
+    def _add(self, day: str, lead: Dict):
+        seq = len(self.leads)
+        keys = lead_keys(day, lead)
+        self.leads.append(lead)
+        self.keys.append(keys)
+        for field, value in zip(INDEXED_FIELDS, keys):
+            if not value:
+                continue
+            postings = self._postings[field].setdefault(value, [])
+            if not postings and field == 'day':
+                parsed = parse_day(day)
+                if parsed:
+                    bisect.insort(self._days_by_date, (parsed, day))
+            postings.append(seq)
+        for listener in self.listeners:
+            try:
+                listener(day, lead)
+            except Exception as e:
+                logger.error(f"Lead index listener error: {e}")
+
+    def __len__(self) -> int:
+        return len(self.leads)
+
+    def _days_in_range(self, date_from: Optional[date], date_to: Optional[date]) -> List[str]:
+        start = bisect.bisect_left(self._days_by_date, (date_from, '')) if date_from else 0
+        days = []
+        for parsed, day in self._days_by_date[start:]:
+            if date_to and parsed > date_to:
+                break
+            days.append(day)
+        return days
+
+    def query(self, day: str = None, date_from: str = None, date_to: str = None,
+              service: str = None, phone: str = None, email: str = None, place: str = None,
+              cursor: int = -1, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Find leads matching every given filter, in storage order
+
+        Args:
+            day: Exact day (dd_mm_YYYY or YYYY-MM-DD)
+            date_from / date_to: Inclusive day range
+            service, phone, email, place: Matched after normalisation
+            cursor: Sequence number of the last lead from the previous page
+            limit: Page size
+
+        Returns:
+            tuple: (matching leads, cursor for the next page or None)
+        """
+        self.sync()
+        with self._lock:
+            # Exact-match filters by position in lead_keys, plus the
+            # posting lists that could satisfy each filter
+            wanted: Dict[int, str] = {}
+            allowed_days = None
+            candidates: List[List[List[int]]] = []
+
+            if day:
+                parsed = parse_day(day)
+                wanted[0] = parsed.strftime(DAY_FORMAT) if parsed else day
+                candidates.append([self._postings['day'].get(wanted[0], [])])
+            elif date_from or date_to:
+                days = self._days_in_range(parse_day(date_from) if date_from else None,
+                                           parse_day(date_to) if date_to else None)
+                allowed_days = set(days)
+                candidates.append([self._postings['day'][d] for d in days])
+
+            for position, (field, raw, normalize) in enumerate((
+                    ('service', service, str),
+                    ('phone', phone, normalize_phone),
+                    ('email', email, normalize_email),
+                    ('place', place, normalize_text)), start=1):
+                if raw:
+                    wanted[position] = normalize(raw)
+                    candidates.append([self._postings[field].get(wanted[position], [])])
+
+            # Walk the smallest candidate set and check the other filters per lead
+            if candidates:
+                lists = min(candidates, key=lambda ls: sum(len(l) for l in ls))
+                streams = [map(l.__getitem__, range(bisect.bisect_right(l, cursor), len(l))) for l in lists]
+                seqs: Iterator[int] = heapq.merge(*streams) if len(streams) > 1 else (streams[0] if streams else iter(()))
+            else:
+                seqs = iter(range(max(cursor + 1, 0), len(self.leads)))
+
+            results = []
+            last = None
+            for seq in seqs:
+                keys = self.keys[seq]
+                if any(keys[position] != value for position, value in wanted.items()):
+                    continue
+                if allowed_days is not None and keys[0] not in allowed_days:
+                    continue
+                results.append(self.leads[seq])
+                last = seq
+                if len(results) >= limit:
+                    break
+
+            next_cursor = last if len(results) >= limit else None
+            return results, next_cursor
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'leads': len(self.leads),
+                'days': len(self._postings['day']),
+                'distinct': {field: len(self._postings[field]) for field in INDEXED_FIELDS},
+            }
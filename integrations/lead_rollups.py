@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained lead counts for dashboards
+Counts leads per day by service, place and hour as they are stored, so
+reports never scan the lead history
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from integrations.lead_store import LeadStore
+from integrations.lead_index import normalize_text, parse_day, DAY_SCAN_INTERVAL, OPEN_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the checkpoint layout changes; older files are rebuilt
+CHECKPOINT_VERSION = 1
+
+# Seconds between checkpoints while leads keep arriving
+CHECKPOINT_INTERVAL = 60.0
+
+
+class Rollup:
+    """Lead counts for one day, or summed over several"""
+
+    __slots__ = ('total', 'duplicates', 'services', 'places', 'hours')
+
+    def __init__(self):
+        self.total = 0
+        self.duplicates = 0
+        self.services: Dict[str, int] = {}
+        self.places: Dict[str, int] = {}
+        self.hours: List[int] = [0] * 24
+
+    def add(self, service: str, place: str, hour: Optional[int], duplicate: bool):
+        self.total += 1
+        if duplicate:
+            self.duplicates += 1
+        self.services[service] = self.services.get(service, 0) + 1
+        if place:
+            self.places[place] = self.places.get(place, 0) + 1
+        if hour is not None:
+            self.hours[hour] += 1
+
+    def merge(self, other: 'Rollup'):
+        self.total += other.total
+        self.duplicates += other.duplicates
+        for service, count in other.services.items():
+            self.services[service] = self.services.get(service, 0) + count
+        for place, count in other.places.items():
+            self.places[place] = self.places.get(place, 0) + count
+        for hour, count in enumerate(other.hours):
+            self.hours[hour] += count
+
+    def to_dict(self) -> Dict:
+        return {
+            'total': self.total,
+            'duplicates': self.duplicates,
+            'services': self.services,
+            'places': self.places,
+            'hours': self.hours,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Rollup':
+        rollup = cls()
+        rollup.total = int(data['total'])
+        rollup.duplicates = int(data.get('duplicates', 0))
+        rollup.services = {str(k): int(v) for k, v in data['services'].items()}
+        rollup.places = {str(k): int(v) for k, v in data['places'].items()}
+        hours = [int(v) for v in data['hours']]
+        if len(hours) != 24:
+            raise ValueError('hours must have 24 entries')
+        rollup.hours = hours
+        return rollup
+
+
+def _hour(lead: Dict) -> Optional[int]:
+    try:
+        hour = int(str(lead.get('timestamp', ''))[:2])
+    except ValueError:
+        return None
+    return hour if 0 <= hour < 24 else None
+
+
+class LeadRollups:
+    """
+    Per-day Rollups over a LeadStore, kept current by tailing its segments.
+
+    sync(day) after a submission counts only the bytes appended since the
+    last call, which also picks up other workers' leads. Counts and segment
+    offsets are checkpointed to a JSON file, so a restart reads only what
+    was stored since the checkpoint; rebuild() recounts from the store.
+    All-time totals are kept alongside the days, so a summary costs the
+    same however much history is stored.
+    """
+
+    def __init__(self, store: LeadStore, checkpoint_path=None,
+                 checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.store = store
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_interval = checkpoint_interval
+        self.days: Dict[str, Rollup] = {}
+        self.total = Rollup()
+        # Parsed day keys, so range queries never parse dates
+        self._dates: Dict[str, date] = {}
+        # Places are counted by normalised name and reported as first seen
+        self.place_labels: Dict[str, str] = {}
+        self._offsets: Dict[str, int] = {}
+        self._days_scanned_at = 0.0
+        self._dirty = False
+        self._checkpointed_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _reset(self):
+        self.days = {}
+        self._dates = {}
+        self.total = Rollup()
+        self.place_labels = {}
+        self._offsets = {}
+        self._days_scanned_at = 0.0
+
+    def load(self):
+        """Restore the checkpoint (rebuilding if it is missing or unreadable) and catch up"""
+        start = time.perf_counter()
+        with self._lock:
+            if not self._load_checkpoint():
+                self.rebuild()
+                return
+            self._days_scanned_at = 0.0
+            self.sync()
+        logger.info(f"Loaded lead rollups for {len(self.days)} days in "
+                    f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _load_checkpoint(self) -> bool:
+        if not self.checkpoint_path or not self.checkpoint_path.exists():
+            return False
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CHECKPOINT_VERSION:
+                logger.info("Lead rollup checkpoint is from another version, rebuilding")
+                return False
+            days = {day: Rollup.from_dict(rollup) for day, rollup in data['days'].items()}
+            offsets = {day: int(offset) for day, offset in data['offsets'].items()}
+            labels = {str(k): str(v) for k, v in data.get('place_labels', {}).items()}
+        except Exception as e:
+            logger.warning(f"Unreadable lead rollup checkpoint, rebuilding: {e}")
+            return False
+        self._reset()
+        self.days = days
+        self._dates = {day: parse_day(day) or date.min for day in days}
+        self._offsets = offsets
+        self.place_labels = labels
+        for rollup in days.values():
+            self.total.merge(rollup)
+        return True
+
+    def rebuild(self):
+        """Recount every stored lead from scratch"""
+        start = time.perf_counter()
+        with self._lock:
+            self._reset()
+            self.sync()
+            self.checkpoint(force=True)
+        logger.info(f"Rebuilt lead rollups from {self.total.total} leads in "
+                    f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def sync(self, day: str = None):
+        """
+        Count records appended since the last sync
+
+        With a day, only that segment is read. Otherwise the open segments
+        (today and yesterday) are, and new segments are looked for once per
+        DAY_SCAN_INTERVAL.
+        """
+        with self._lock:
+            if day is not None:
+                days = [day]
+            else:
+                days = []
+                now = time.monotonic()
+                if now - self._days_scanned_at >= DAY_SCAN_INTERVAL:
+                    self._days_scanned_at = now
+                    days = [d for d in self.store.days() if d not in self._offsets]
+                oldest_open = date.today() - timedelta(days=OPEN_DAYS)
+                days += [d for d, parsed in self._dates.items() if parsed >= oldest_open]
+            for segment_day in days:
+                self._sync_day(segment_day)
+            self._maybe_checkpoint()
+
+    def _sync_day(self, day: str):
+        offset = self._offsets.get(day, 0)
+        leads, new_offset = self.store.read_from(day, offset)
+        self._offsets[day] = new_offset
+        for lead in leads:
+            self.add(day, lead)
+
+    def add(self, day: str, lead: Dict):
+        """Count one stored lead"""
+        service = str(lead.get('service', '') or '')
+        place = normalize_text(lead.get('place'))
+        hour = _hour(lead)
+        duplicate = lead.get('duplicate_of') is not None
+        with self._lock:
+            if place and place not in self.place_labels:
+                self.place_labels[place] = str(lead.get('place')).strip()
+            rollup = self.days.get(day)
+            if rollup is None:
+                rollup = self.days[day] = Rollup()
+                self._dates[day] = parse_day(day) or date.min
+            rollup.add(service, place, hour, duplicate)
+            self.total.add(service, place, hour, duplicate)
+            self._dirty = True
+
+    def _maybe_checkpoint(self):
+        if self._dirty and time.monotonic() - self._checkpointed_at >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """Write counts and offsets atomically; returns True if written"""
+        if not self.checkpoint_path:
+            return False
+        with self._lock:
+            if not (self._dirty or force):
+                return False
+            data = {
+                'version': CHECKPOINT_VERSION,
+                'offsets': dict(self._offsets),
+                'days': {day: rollup.to_dict() for day, rollup in self.days.items()},
+                'place_labels': dict(self.place_labels),
+            }
+            self._dirty = False
+            self._checkpointed_at = time.monotonic()
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.checkpoint_path)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing lead rollup checkpoint: {e}")
+            self._dirty = True
+            return False
+
+    def _report(self, rollup: Rollup) -> Dict:
+        return {
+            'total': rollup.total,
+            'duplicates': rollup.duplicates,
+            'by_service': dict(sorted(rollup.services.items(), key=lambda item: -item[1])),
+            'by_place': {self.place_labels.get(place, place): count for place, count in
+                         sorted(rollup.places.items(), key=lambda item: -item[1])},
+            'by_hour': {f"{hour:02d}": count for hour, count in enumerate(rollup.hours)},
+        }
+
+    def _days_between(self, date_from: Optional[date], date_to: Optional[date]) -> Iterable[str]:
+        for day, parsed in self._dates.items():
+            if (date_from and parsed < date_from) or (date_to and parsed > date_to):
+                continue
+            yield day
+
+    def summary(self, date_from: date = None, date_to: date = None) -> Dict:
+        """
+        Counts by service, place and hour, and leads per day
+
+        Without a range the all-time totals are returned as they are; with
+        one, only the matching days' rollups are added up.
+        """
+        with self._lock:
+            if date_from is None and date_to is None:
+                rollup, days = self.total, list(self.days)
+            else:
+                rollup, days = Rollup(), list(self._days_between(date_from, date_to))
+                for day in days:
+                    rollup.merge(self.days[day])
+            report = self._report(rollup)
+            days.sort(key=self._dates.__getitem__)
+            report['by_day'] = {day: self.days[day].total for day in days}
+            return report
+
+    def day(self, day: str) -> Optional[Dict]:
+        """Counts for a single day, or None if nothing was stored that day"""
+        with self._lock:
+            rollup = self.days.get(day)
+            return self._report(rollup) if rollup else None
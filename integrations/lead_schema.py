@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Lead schema shared by every submission entry point
+Validates and normalises a form payload and builds the storage record and
+the Google Sheets data from it
+"""
+
+from typing import Dict, Optional, Tuple
+
+# Fields every lead must have, in storage order
+COMMON_FIELDS = ('service', 'name', 'phone', 'email', 'place')
+
+# Extra fields per service as (field, label used in the sheet's Notes column)
+SERVICE_FIELDS = {
+    'Education India': (('education_place', 'Place'), ('course', 'Course')),
+    'Education Abroad': (('education_country', 'Country'),),
+    'Job Europe': (('work', 'Job Type'),),
+}
+
+SERVICES = tuple(SERVICE_FIELDS)
+
+
+class ValidatedLead:
+    """A normalised lead ready to be stored and sent to Google Sheets"""
+
+    __slots__ = ('record', '_notes')
+
+    def __init__(self, record: Dict, notes: str):
+        self.record = record
+        self._notes = notes
+
+    @property
+    def service(self) -> str:
+        return self.record['service']
+
+    def sheet_data(self, lead_id: str = '') -> Dict:
+        """Data in the shape GoogleSheetsManager.build_row expects"""
+        record = self.record
+        return {
+            'user_id': lead_id,
+            'service_type': record['service'],
+            'place': record['place'],
+            'name': record['name'],
+            'phone': record['phone'],
+            'email': record['email'],
+            'documents': '',
+            'notes': self._notes,
+        }
+
+
+class _CompiledService:
+    __slots__ = ('name', 'fields', 'notes')
+
+    def __init__(self, name: str, extra: Tuple[Tuple[str, str], ...]):
+        self.name = name
+        self.fields = COMMON_FIELDS + tuple(field for field, _ in extra)
+        # Notes column template, e.g. 'Place: {education_place} | Course: {course}'
+        self.notes = ' | '.join(f"{label}: {{{field}}}" for field, label in extra)
+
+
+class LeadSchema:
+    """
+    Lead schema compiled once into a per-service dispatch table.
+
+    validate() looks up the service, then makes a single pass over that
+    service's field list, normalising values and collecting every missing
+    field, instead of a chain of per-service checks at each call site.
+    """
+
+    def __init__(self, service_fields: Dict[str, Tuple[Tuple[str, str], ...]] = None):
+        service_fields = SERVICE_FIELDS if service_fields is None else service_fields
+        self._services = {name: _CompiledService(name, extra) for name, extra in service_fields.items()}
+        # Services outside the table are accepted with the common fields only
+        self._fallback = _CompiledService('', ())
+
+    def validate(self, data) -> Tuple[Optional[ValidatedLead], Optional[Dict]]:
+        """
+        Validate and normalise a submitted payload
+
+        Returns:
+            tuple: (ValidatedLead, None) on success, or (None, error) where
+                   error has an 'error' message and a list of 'errors'
+                   ({'field', 'code'}) for each problem found
+        """
+        if not isinstance(data, dict):
+            return None, {'error': 'Request body must be a JSON object',
+                          'errors': [{'field': None, 'code': 'invalid_body'}]}
+
+        service_name = data.get('service')
+        spec = self._services.get(service_name, self._fallback) if isinstance(service_name, str) else self._fallback
+
+        get = data.get
+        record = {}
+        missing = None
+        for field in spec.fields:
+            value = get(field)
+            if value.__class__ is not str:
+                value = str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else ''
+            value = value.strip()
+            if value:
+                record[field] = value
+            elif missing is None:
+                missing = [field]
+            else:
+                missing.append(field)
+
+        if missing:
+            common_missing = [field for field in missing if field in COMMON_FIELDS]
+            if common_missing:
+                message = f'Missing required fields: {", ".join(common_missing)}'
+            else:
+                noun = 'field' if len(missing) == 1 else 'fields'
+                message = f'Missing required {noun} for {spec.name}: {", ".join(missing)}'
+            return None, {'error': message,
+                          'errors': [{'field': field, 'code': 'required'} for field in missing]}
+
+        return ValidatedLead(record, spec.notes.format_map(record) if spec.notes else ''), None
+
+
+# Compiled once at import and shared by server.py and the Vercel handlers
+LEAD_SCHEMA = LeadSchema()
+
+
+def validate_lead(data) -> Tuple[Optional[ValidatedLead], Optional[Dict]]:
+    """Validate a payload against the shared lead schema"""
+    return LEAD_SCHEMA.validate(data)
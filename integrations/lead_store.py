@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Append-only lead storage for Dream Axis Lead Collection Website
+Stores each lead as one NDJSON record in a per-day segment file; closed days
+can be compacted into compressed monthly archives and are read from there
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime, date
+from pathlib import Path
+
+from integrations.lead_archive import (
+    LeadArchive, ArchiveWriter, ArchiveError, ARCHIVE_SUFFIX, CODEC_LZMA
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Day keys use the same format as the legacy daily_leads.json layout
+DAY_FORMAT = "%d_%m_%Y"
+SEGMENT_SUFFIX = ".ndjson"
+LOCK_FILE = ".lock"
+ARCHIVE_DIR = "archive"
+# Written while a compaction swaps segments for an archive (see compact)
+JOURNAL_FILE = "compact.journal"
+# Written once every segment of a legacy import is ready (see migrate_from_json)
+MIGRATE_JOURNAL_FILE = ".migrate.journal"
+ARCHIVING_SUFFIX = ".archiving"
+
+# Seconds the set of archive files is trusted before it is checked again
+ARCHIVE_SCAN_INTERVAL = 1.0
+
+
+def _day_sort_key(day: str):
+    """Sort dd_mm_YYYY keys chronologically, unknown keys last"""
+    try:
+        return (0, datetime.strptime(day, DAY_FORMAT))
+    except ValueError:
+        return (1, day)
+
+
+def _encode(lead: Dict) -> bytes:
+    return (json.dumps(lead, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class StoreLock:
+    """
+    Advisory lock shared by every thread and process writing to a store.
+
+    The lock file is reopened on each acquisition so that processes forked
+    from a parent that already used the store never share a lock handle.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        except Exception:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._thread_lock.release()
+
+
+class LeadStore:
+    """
+    Append-only lead log split into one NDJSON segment file per day.
+
+    Writing a lead appends a single line to today's segment, so the cost of a
+    submission does not depend on how many leads are already stored. A crash
+    can at worst leave a torn final line, which readers skip.
+
+    compact() moves closed days into one LeadArchive per month under
+    archive/. An archived day reads as its segment did, followed by anything
+    appended to a segment for that day since, so readers keep their offsets.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = StoreLock(self.root_dir / LOCK_FILE)
+        self.archive_dir = self.root_dir / ARCHIVE_DIR
+        # Open archives by file name with the (inode, mtime, size) they were
+        # opened at, and the archive holding each day
+        self._archives: Dict[str, Tuple[Tuple, LeadArchive]] = {}
+        self._archived: Dict[str, LeadArchive] = {}
+        self._archives_scanned_at = None
+        self._archive_lock = threading.Lock()
+        if (self.archive_dir / JOURNAL_FILE).exists():
+            with self.lock:
+                self._recover_compaction()
+
+    def _segment_path(self, day: str) -> Path:
+        return self.root_dir / f"{day}{SEGMENT_SUFFIX}"
+
+    def append(self, day: str, lead: Dict, fsync: bool = False) -> bool:
+        """
+        Append a lead to the segment for the given day
+
+        Args:
+            day: Day key in dd_mm_YYYY format
+            lead: Dictionary containing lead information
+            fsync: Flush the segment to disk before returning
+
+        Returns:
+            bool: True if written successfully, False otherwise
+        """
+        return self.append_batch([(day, lead)], fsync=fsync)
+
+    def append_batch(self, items: Iterable[Tuple[str, Dict]], fsync: bool = False) -> bool:
+        """
+        Append several (day, lead) pairs under a single lock acquisition
+
+        Each day's segment is opened once and written with one call, so a
+        batch costs roughly the same as a single lead.
+        """
+        by_day: Dict[str, List[bytes]] = {}
+        for day, lead in items:
+            by_day.setdefault(day, []).append(_encode(lead))
+
+        try:
+            with self.lock:
+                for day, records in by_day.items():
+                    with open(self._segment_path(day), 'a+b') as f:
+                        # Start on a fresh line if a previous write was torn
+                        if f.tell() > 0:
+                            f.seek(-1, os.SEEK_END)
+                            if f.read(1) != b'\n':
+                                f.write(b'\n')
+                        f.write(b''.join(records))
+                        if fsync:
+                            f.flush()
+                            os.fsync(f.fileno())
+            return True
+        except Exception as e:
+            logger.error(f"Error appending {sum(map(len, by_day.values()))} leads: {e}")
+            return False
+
+    def _segment_days(self) -> List[str]:
+        return [p.name[:-len(SEGMENT_SUFFIX)] for p in self.root_dir.glob(f"*{SEGMENT_SUFFIX}")]
+
+    def days(self) -> List[str]:
+        """List stored day keys, live and archived, in chronological order"""
+        days = set(self._segment_days())
+        days.update(self._archives_by_day())
+        return sorted(days, key=_day_sort_key)
+
+    def archived_days(self) -> List[str]:
+        """Days held in archive files, in chronological order"""
+        return sorted(self._archives_by_day(), key=_day_sort_key)
+
+    def size_bytes(self) -> int:
+        """Total size of all day segments and archives on disk"""
+        total = 0
+        paths = list(self.root_dir.glob(f"*{SEGMENT_SUFFIX}")) + list(self.archive_dir.glob(f"*{ARCHIVE_SUFFIX}"))
+        for path in paths:
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _archives_by_day(self) -> Dict[str, LeadArchive]:
+        """
+        Archive holding each archived day
+
+        The archive directory is checked at most once per
+        ARCHIVE_SCAN_INTERVAL; a file replaced by another process's
+        compaction is reopened. Readers still holding the old archive keep
+        reading its mapping, which stays valid after the file is replaced.
+        """
+        now = time.monotonic()
+        if self._archives_scanned_at is not None and now - self._archives_scanned_at < ARCHIVE_SCAN_INTERVAL:
+            return self._archived
+        with self._archive_lock:
+            archives = {}
+            for path in sorted(self.archive_dir.glob(f"*{ARCHIVE_SUFFIX}")):
+                try:
+                    stat = path.stat()
+                    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                    known = self._archives.get(path.name)
+                    archives[path.name] = known if known and known[0] == version else (version, LeadArchive(path))
+                except (OSError, ArchiveError) as e:
+                    logger.error(f"Skipping lead archive {path.name}: {e}")
+            self._archives = archives
+            self._archived = {day: archive for _, archive in archives.values() for day in archive.days}
+            self._archives_scanned_at = now
+            return self._archived
+
+    def iter_lines(self, day: str) -> Iterator[bytes]:
+        """Yield the raw NDJSON lines stored for a day, without decoding them"""
+        archive = self._archives_by_day().get(day)
+        if archive is not None:
+            yield from archive.iter_lines(day)
+        path = self._segment_path(day)
+        if not path.exists():
+            return
+        with open(path, 'rb') as f:
+            for line in f:
+                # A line without a newline may still be being written
+                if line.endswith(b'\n') and line.strip():
+                    yield line
+
+    def iter_day(self, day: str) -> Iterator[Dict]:
+        """Yield the leads stored for a day, skipping unreadable lines"""
+        for line_number, line in enumerate(self.iter_lines(day), 1):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable record {day}:{line_number}")
+
+    def read_from(self, day: str, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Read complete records appended to a day's segment after offset
+
+        A trailing line without a newline may still be being written, so it
+        is left for the next call.
+
+        For an archived day, offsets run through the archived data and then
+        on into any segment written for the day since.
+
+        Returns:
+            tuple: (leads, offset to resume from)
+        """
+        archived = b''
+        segment_start = 0
+        archive = self._archives_by_day().get(day)
+        if archive is not None:
+            segment_start = archive.size(day)
+            if offset < segment_start:
+                # Ends with a newline, so the segment continues on a new line
+                archived = archive.read(day, offset)
+        try:
+            with open(self._segment_path(day), 'rb') as f:
+                f.seek(max(offset - segment_start, 0))
+                data = archived + f.read()
+        except FileNotFoundError:
+            data = archived
+        end = data.rfind(b'\n') + 1
+        leads = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                leads.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping unreadable record in {day}")
+        return leads, offset + end
+
+    def load_day(self, day: str) -> List[Dict]:
+        """Load all leads stored for a day"""
+        return list(self.iter_day(day))
+
+    def load_all(self) -> Dict[str, List[Dict]]:
+        """Load every stored lead in the legacy {"dd_mm_YYYY": [...]} shape"""
+        return {day: self.load_day(day) for day in self.days()}
+
+    def migrate_from_json(self, json_path) -> Optional[int]:
+        """
+        One-time import of a legacy daily_leads.json file
+
+        Legacy leads are placed before anything already in the matching
+        segment, and the source file is renamed to *.migrated afterwards so
+        the import never runs twice. Every new segment is written aside
+        before a journal is recorded and any of them is swapped in, so an
+        import interrupted by a crash is finished (not repeated) on the
+        next call.
+
+        Returns:
+            int: Number of leads imported, or None if there was nothing to do
+        """
+        json_path = Path(json_path)
+        journal_path = self.root_dir / MIGRATE_JOURNAL_FILE
+        if not json_path.exists() and not journal_path.exists():
+            return None
+
+        with self.lock:
+            if journal_path.exists():
+                return self._finish_migration(journal_path)
+            # Another worker may have finished the import while we waited
+            if not json_path.exists():
+                return None
+            return self._migrate_locked(json_path)
+
+    def _migrate_locked(self, json_path: Path) -> Optional[int]:
+        try:
+            with open(json_path, 'r') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading legacy leads file {json_path}: {e}")
+            return None
+
+        imported = 0
+        segments = {}
+        for day, leads in legacy.items():
+            if not leads:
+                continue
+            segment = self._segment_path(day)
+            tmp_path = segment.with_name(segment.name + '.tmp')
+            with open(tmp_path, 'wb') as out:
+                for lead in leads:
+                    out.write(_encode(lead))
+                if segment.exists():
+                    with open(segment, 'rb') as existing:
+                        out.write(existing.read())
+                out.flush()
+                os.fsync(out.fileno())
+            # Size of the segment the new one was built from
+            segments[segment.name] = segment.stat().st_size if segment.exists() else 0
+            imported += len(leads)
+
+        journal_path = self.root_dir / MIGRATE_JOURNAL_FILE
+        with open(journal_path, 'w') as f:
+            json.dump({'json': str(json_path), 'imported': imported, 'segments': segments}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        return self._finish_migration(journal_path)
+
+    def _finish_migration(self, journal_path: Path) -> Optional[int]:
+        """Swap in the segments recorded in the journal and retire the legacy file"""
+        try:
+            with open(journal_path, 'r') as f:
+                journal = json.load(f)
+        except ValueError:
+            # Torn while being written, before any segment was swapped in
+            journal_path.unlink()
+            for tmp_path in self.root_dir.glob(f"*{SEGMENT_SUFFIX}.tmp"):
+                tmp_path.unlink()
+            return None
+
+        for name, built_from in journal['segments'].items():
+            segment = self.root_dir / name
+            tmp_path = segment.with_name(name + '.tmp')
+            if not tmp_path.exists():
+                continue  # already swapped in
+            if segment.exists() and segment.stat().st_size > built_from:
+                # Leads appended since the new segment was built
+                with open(segment, 'rb') as existing, open(tmp_path, 'ab') as out:
+                    existing.seek(built_from)
+                    out.write(existing.read())
+                    out.flush()
+                    os.fsync(out.fileno())
+            os.replace(tmp_path, segment)
+
+        json_path = Path(journal['json'])
+        if json_path.exists():
+            json_path.rename(json_path.with_name(json_path.name + '.migrated'))
+        journal_path.unlink()
+        logger.info(f"Migrated {journal['imported']} leads from {json_path} into {self.root_dir}")
+        return journal['imported']
+
+    def compact(self, before: date, codec: str = CODEC_LZMA) -> int:
+        """
+        Move the segments of days before a date into monthly archives
+
+        Each month's archive is rewritten with the new days added (blocks of
+        days already archived are copied without recompressing) and swapped
+        in atomically. The segments it replaces are renamed aside first and
+        deleted afterwards, guided by a journal, so a crash at any point
+        leaves every lead readable exactly once.
+
+        Args:
+            before: Days before this date are archived
+            codec: Compression for new archive files ('lzma' or 'zlib')
+
+        Returns:
+            int: Number of days archived
+        """
+        by_month: Dict[str, List[str]] = {}
+        for day in self._segment_days():
+            try:
+                parsed = datetime.strptime(day, DAY_FORMAT).date()
+            except ValueError:
+                continue
+            if parsed < before:
+                by_month.setdefault(parsed.strftime('%Y-%m'), []).append(day)
+        if not by_month:
+            return 0
+
+        self.archive_dir.mkdir(exist_ok=True)
+        archived = 0
+        with self.lock:
+            self._recover_compaction()
+            for month, days in sorted(by_month.items()):
+                start = time.perf_counter()
+                days = [day for day in days if self._segment_path(day).exists()]
+                before_bytes = sum(self._segment_path(day).stat().st_size for day in days)
+                path = self._compact_month(month, days, codec)
+                archived += len(days)
+                logger.info(f"Archived {len(days)} days into {path.name}: {before_bytes} bytes of segments "
+                            f"now {path.stat().st_size} bytes in total, "
+                            f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        self._archives_scanned_at = None
+        return archived
+
+    def _compact_month(self, month: str, days: List[str], codec: str) -> Path:
+        path = self.archive_dir / f"{month}{ARCHIVE_SUFFIX}"
+        tmp_path = path.with_name(path.name + '.tmp')
+        existing = LeadArchive(path) if path.exists() else None
+        writer = ArchiveWriter(tmp_path, codec=existing.codec if existing else codec)
+        try:
+            archived_days = set(existing.days) if existing else set()
+            for day in sorted(archived_days | set(days), key=_day_sort_key):
+                if day in archived_days:
+                    writer.copy_day(existing, day)
+                if day in days:
+                    # Late leads for an archived day follow what was archived
+                    writer.add_day(day, self._segment_path(day).read_bytes())
+            archive_id = writer.finish()
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            if existing:
+                existing.close()
+
+        journal = {'archive': path.name, 'id': archive_id,
+                   'segments': [self._segment_path(day).name for day in days]}
+        journal_path = self.archive_dir / JOURNAL_FILE
+        with open(journal_path, 'w') as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            for name in journal['segments']:
+                segment = self.root_dir / name
+                os.replace(segment, segment.with_name(name + ARCHIVING_SUFFIX))
+            os.replace(tmp_path, path)
+        except Exception:
+            # Puts the segments back, since the archive was not swapped in
+            self._recover_compaction()
+            raise
+        self._recover_compaction()
+        return path
+
+    def _recover_compaction(self):
+        """Finish or roll back a compaction interrupted after its journal was written"""
+        journal_path = self.archive_dir / JOURNAL_FILE
+        if not journal_path.exists():
+            return
+        try:
+            with open(journal_path, 'r') as f:
+                journal = json.load(f)
+        except ValueError:
+            # Torn while being written, before any segment was moved
+            journal_path.unlink()
+            return
+        try:
+            try:
+                archive = LeadArchive(self.archive_dir / journal['archive'])
+                committed = archive.id == journal['id']
+                archive.close()
+            except ArchiveError:
+                committed = False
+            for name in journal['segments']:
+                aside = self.root_dir / (name + ARCHIVING_SUFFIX)
+                if not aside.exists():
+                    continue
+                if committed:
+                    aside.unlink()
+                else:
+                    os.replace(aside, self.root_dir / name)
+            tmp_path = self.archive_dir / (journal['archive'] + '.tmp')
+            if tmp_path.exists():
+                tmp_path.unlink()
+            journal_path.unlink()
+        except Exception as e:
+            logger.error(f"Error recovering interrupted lead compaction: {e}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Group-commit writer for the lead store
+Collects leads from request threads and commits them to disk in batches
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from integrations.lead_store import LeadStore
+from integrations.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+COMMIT_LATENCY = REGISTRY.histogram('lead_store_commit_seconds', 'Time to append (and fsync) one batch of leads')
+COMMIT_SIZE = REGISTRY.histogram('lead_store_commit_leads', 'Leads per committed batch',
+                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+COMMIT_FAILURES = REGISTRY.counter('lead_store_commit_failures_total', 'Batches that could not be committed')
+
+# fsync policies: after every batch, at most once per interval, or never
+FSYNC_BATCH = 'batch'
+FSYNC_INTERVAL = 'interval'
+FSYNC_NEVER = 'never'
+FSYNC_POLICIES = (FSYNC_BATCH, FSYNC_INTERVAL, FSYNC_NEVER)
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Single background thread that owns all writes to a LeadStore.
+
+    Request threads enqueue a lead and wait on a future that resolves once
+    the batch containing it has been committed. Leads that arrive while a
+    batch is being written are picked up by the next one, so under load the
+    number of disk writes grows with the number of batches, not leads.
+    Leads submitted together with submit_many() always share one commit.
+    """
+
+    def __init__(self, store: LeadStore, max_batch_size: int = 256,
+                 max_delay: float = 0.002, fsync_policy: str = FSYNC_BATCH,
+                 fsync_interval: float = 1.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync_policy!r}, expected one of {FSYNC_POLICIES}")
+
+        self.store = store
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._last_fsync = 0.0
+        self._pid = None
+
+    @classmethod
+    def from_env(cls, store: LeadStore) -> 'GroupCommitWriter':
+        """Build a writer configured through LEADS_* environment variables"""
+        return cls(
+            store,
+            max_batch_size=int(os.getenv('LEADS_MAX_BATCH', 256)),
+            max_delay=float(os.getenv('LEADS_MAX_DELAY_MS', 2)) / 1000.0,
+            fsync_policy=os.getenv('LEADS_FSYNC', FSYNC_BATCH),
+            fsync_interval=float(os.getenv('LEADS_FSYNC_INTERVAL', 1.0)),
+        )
+
+    def start(self):
+        """Start the writer thread (again, if this process was forked)"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Items queued in a parent process belong to the parent
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='lead-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, day: str, lead: Dict) -> Future:
+        """Queue a lead for the next batch and return its commit future"""
+        return self.submit_many([(day, lead)])
+
+    def submit_many(self, items: List[Tuple[str, Dict]]) -> Future:
+        """Queue (day, lead) pairs to be committed together; returns one future"""
+        if self._pid != os.getpid() or not (self._thread and self._thread.is_alive()):
+            self.start()
+        future: Future = Future()
+        self._queue.put((items, future))
+        return future
+
+    def write(self, day: str, lead: Dict, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Queue a lead and wait until its batch has been committed
+
+        Returns:
+            bool: True if the lead is on disk, False otherwise
+        """
+        return self.write_many([(day, lead)], timeout)
+
+    def write_many(self, items: List[Tuple[str, Dict]], timeout: Optional[float] = 10.0) -> bool:
+        """Queue (day, lead) pairs and wait until their shared commit is done"""
+        try:
+            return self.submit_many(items).result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Error waiting for lead commit: {e}")
+            return False
+
+    def queue_depth(self) -> int:
+        """Submissions waiting for the writer thread"""
+        return self._queue.qsize()
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Commit everything already queued and stop the writer thread"""
+        thread = self._thread
+        if not thread or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        """Gather up to max_batch_size leads, waiting at most max_delay"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while size < self.max_batch_size:
+            try:
+                # Take whatever is already queued before waiting at all
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _should_fsync(self) -> bool:
+        if self.fsync_policy == FSYNC_BATCH:
+            return True
+        if self.fsync_policy == FSYNC_INTERVAL:
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                self._last_fsync = now
+                return True
+        return False
+
+    def _commit(self, batch: List):
+        # A cancelled future's caller has given up, so its leads are left
+        # out; the rest can no longer be cancelled once marked running
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        ok = self.store.append_batch((item for items, _ in batch for item in items),
+                                     fsync=self._should_fsync())
+        COMMIT_LATENCY.observe(time.perf_counter() - start)
+        COMMIT_SIZE.observe(sum(len(items) for items, _ in batch))
+        for _, future in batch:
+            future.set_result(ok)
+        if not ok:
+            COMMIT_FAILURES.inc()
+            logger.error(f"Failed to commit batch of {sum(len(items) for items, _ in batch)} leads")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                logger.error(f"Lead writer error: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(False)
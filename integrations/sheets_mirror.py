@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Incremental in-memory mirror of the leads worksheet
+Fetches only rows added since the last refresh instead of the whole sheet
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Leads occupy columns A..J (see GoogleSheetsManager.build_row)
+LAST_COLUMN = 'J'
+
+# Column A holds the lead id
+ID_COLUMN = 0
+
+
+class SheetMirror:
+    """
+    Local copy of a worksheet's rows, refreshed by range.
+
+    The first refresh reads the header row and all data; every later one
+    reads only A{next_row}:J. Within the TTL, reads are served from memory
+    with no API call. Rows edited or deleted in the sheet by hand are only
+    picked up after invalidate().
+    """
+
+    def __init__(self, worksheet, ttl: float = 30.0):
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self.headers: List[str] = []
+        self.rows: List[List] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def next_row(self) -> int:
+        """1-based sheet row where the next unseen data row would be"""
+        return len(self.rows) + 2
+
+    def invalidate(self, full: bool = False):
+        """Force the next read to refresh; full=True also drops cached rows"""
+        with self._lock:
+            self._refreshed_at = 0.0
+            if full:
+                self.headers = []
+                self.rows = []
+                self._row_by_id = {}
+
+    def _index_rows(self, start: int):
+        """Add rows[start:] to the lead id index"""
+        for index in range(start, len(self.rows)):
+            row = self.rows[index]
+            if len(row) > ID_COLUMN and row[ID_COLUMN]:
+                self._row_by_id[str(row[ID_COLUMN])] = index + 2
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Fetch rows appended since the last refresh if the TTL has expired
+
+        Returns:
+            bool: True if the mirror is up to date, False if the read failed
+        """
+        with self._lock:
+            if not force and self._refreshed_at and time.monotonic() - self._refreshed_at < self.ttl:
+                return True
+            try:
+                if not self.headers:
+                    values = self.worksheet.get(f"A1:{LAST_COLUMN}")
+                    self.headers = values[0] if values else []
+                    self.rows = [list(row) for row in values[1:]]
+                    self._row_by_id = {}
+                    self._index_rows(0)
+                else:
+                    start = len(self.rows)
+                    values = self.worksheet.get(f"A{self.next_row}:{LAST_COLUMN}")
+                    self.rows.extend(list(row) for row in values)
+                    self._index_rows(start)
+                self._refreshed_at = time.monotonic()
+                return True
+            except Exception as e:
+                logger.error(f"Error refreshing sheet mirror: {e}")
+                return False
+
+    def row_for(self, lead_id: str) -> Optional[int]:
+        """1-based sheet row holding a lead id, from the last refresh"""
+        with self._lock:
+            return self._row_by_id.get(str(lead_id))
+
+    def matches_ids(self, ids: List) -> bool:
+        """Whether a fresh read of the id column agrees with the mirror"""
+        with self._lock:
+            known = [str(row[ID_COLUMN]) if len(row) > ID_COLUMN else '' for row in self.rows]
+        # Column reads drop trailing blanks, and the sheet may have grown
+        # since the last refresh; neither means the rows moved
+        while known and not known[-1]:
+            known.pop()
+        fresh = [str(value) for value in ids]
+        return fresh[:len(known)] == known
+
+    def set_cell(self, row_number: int, column: int, value):
+        """Apply a write we made ourselves so the mirror stays in step"""
+        with self._lock:
+            index = row_number - 2
+            if 0 <= index < len(self.rows):
+                row = self.rows[index]
+                if len(row) <= column:
+                    row.extend([''] * (column + 1 - len(row)))
+                row[column] = value
+
+    def records(self) -> List[Dict]:
+        """Rows as header-keyed dicts, matching worksheet.get_all_records()"""
+        self.refresh()
+        try:
+            from gspread.utils import numericise_all
+        except ImportError:
+            numericise_all = None
+        with self._lock:
+            headers = self.headers
+            width = len(headers)
+            records = []
+            for row in self.rows:
+                values = (row + [''] * width)[:width]
+                if numericise_all:
+                    values = numericise_all(values, empty2zero=False, default_blank='')
+                records.append(dict(zip(headers, values)))
+            return records
+
+    def stats(self) -> Dict:
+        with self._lock:
+            age: Optional[float] = time.monotonic() - self._refreshed_at if self._refreshed_at else None
+            return {'rows': len(self.rows), 'age': age, 'ttl': self.ttl}
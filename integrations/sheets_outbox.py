@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Durable Google Sheets outbox for Dream Axis Lead Collection Website
+Records pending sheet rows in SQLite and replays them until Google accepts them
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt);
+"""
+
+
+class SheetsOutbox:
+    """
+    SQLite (WAL mode) outbox in front of the Sheets API.
+
+    submit() inserts the row locally and returns; a replay thread claims due
+    rows in batches, sends them with one append_rows call and deletes them
+    on success. Failed batches are retried with exponential backoff. Rows
+    are claimed with a lease, so several processes can share one outbox and
+    rows claimed by a process that died are picked up again after restart.
+    """
+
+    def __init__(self, path, manager, max_batch_size: int = 100, max_delay: float = 2.0,
+                 base_backoff: float = 5.0, max_backoff: float = 900.0,
+                 lease: float = 120.0, poll_interval: float = 5.0):
+        self.path = str(path)
+        self.manager = manager
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._delivered = 0
+        self._failed_attempts = 0
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL + NORMAL survives process crashes without an fsync per insert
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self):
+        """Start the replay thread if it is not running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='sheets-outbox', daemon=True)
+        self._thread.start()
+
+    def submit(self, lead_data: Dict) -> bool:
+        """Record a lead for delivery; returns once it is stored locally"""
+        return self.submit_row(self.manager.build_row(lead_data))
+
+    def submit_row(self, row: List) -> bool:
+        """Record an already built sheet row for delivery"""
+        try:
+            now = time.time()
+            self._connect().execute(
+                'INSERT INTO outbox (row, next_attempt, created) VALUES (?, ?, ?)',
+                (json.dumps(row, ensure_ascii=False), now, now)
+            )
+        except Exception as e:
+            logger.error(f"Error recording lead in Sheets outbox: {e}")
+            return False
+        self._wakeup.set()
+        return True
+
+    def submit_many(self, leads: List[Dict]) -> bool:
+        """Record several leads for delivery in one transaction"""
+        try:
+            now = time.time()
+            rows = [(json.dumps(self.manager.build_row(lead), ensure_ascii=False), now, now) for lead in leads]
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('INSERT INTO outbox (row, next_attempt, created) VALUES (?, ?, ?)', rows)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except Exception as e:
+            logger.error(f"Error recording {len(leads)} leads in Sheets outbox: {e}")
+            return False
+        self._wakeup.set()
+        return True
+
+    def pending(self) -> int:
+        """Number of rows not yet accepted by Google Sheets"""
+        return self._connect().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        conn = self._connect()
+        pending, oldest, max_attempts = conn.execute(
+            'SELECT COUNT(*), MIN(created), MAX(attempts) FROM outbox'
+        ).fetchone()
+        return {
+            'pending': pending,
+            'oldest_age': time.time() - oldest if oldest else 0.0,
+            'max_attempts': max_attempts or 0,
+            'delivered': self._delivered,
+            'failed_attempts': self._failed_attempts,
+        }
+
+    def _claim(self) -> List[Tuple[int, List, int]]:
+        """Lease a batch of due rows so no other worker sends them"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, row, attempts FROM outbox WHERE next_attempt <= ? ORDER BY id LIMIT ?',
+                (now, self.max_batch_size)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    'UPDATE outbox SET next_attempt = ? WHERE id = ?',
+                    [(now + self.lease, row_id) for row_id, _, _ in rows]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [(row_id, json.loads(row), attempts) for row_id, row, attempts in rows]
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempts))
+        return delay * random.uniform(0.5, 1.0)
+
+    def deliver_due(self) -> Tuple[int, bool]:
+        """
+        Send one batch of due rows
+
+        Returns:
+            tuple: (rows claimed, whether Google Sheets accepted them)
+        """
+        batch = self._claim()
+        if not batch:
+            return 0, True
+
+        try:
+            ok = self.manager.append_rows([row for _, row, _ in batch])
+            error = None if ok else 'append_rows failed'
+        except Exception as e:
+            ok, error = False, str(e)
+
+        conn = self._connect()
+        if ok:
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(row_id,) for row_id, _, _ in batch])
+            self._delivered += len(batch)
+        else:
+            now = time.time()
+            conn.executemany(
+                'UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?',
+                [(attempts + 1, now + self._backoff(attempts), error, row_id)
+                 for row_id, _, attempts in batch]
+            )
+            self._failed_attempts += 1
+            logger.warning(f"Sheets delivery of {len(batch)} leads failed, will retry: {error}")
+        return len(batch), ok
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Deliver every due row from the calling thread, stopping at the
+        first failed batch
+
+        Returns:
+            bool: True if no due rows remain
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                claimed, ok = self.deliver_due()
+                if not ok:
+                    return False
+                if not claimed:
+                    return True
+            except Exception as e:
+                logger.error(f"Error flushing Sheets outbox: {e}")
+                return False
+        return False
+
+    def close(self, timeout: Optional[float] = 10.0) -> bool:
+        """Stop the replay thread and make a final delivery attempt"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        return self.flush(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            woken = self._wakeup.wait(self.poll_interval)
+            if self._stopping.is_set():
+                break
+            if woken:
+                # Let a burst of submissions accumulate into one batch
+                self._wakeup.clear()
+                self._stopping.wait(self.max_delay)
+            try:
+                while not self._stopping.is_set():
+                    claimed, ok = self.deliver_due()
+                    if not ok or claimed < self.max_batch_size:
+                        break
+            except Exception as e:
+                logger.error(f"Sheets outbox replay error: {e}")
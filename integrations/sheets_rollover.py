@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Worksheet rollover for the leads spreadsheet
+Sends new rows to a monthly (or N-row) tab so the live worksheet stays small,
+and picks the tabs that can hold leads from a date range
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROLLOVER_NONE = 'none'
+ROLLOVER_MONTHLY = 'monthly'
+ROLLOVER_ROWS = 'rows'
+ROLLOVER_POLICIES = (ROLLOVER_NONE, ROLLOVER_MONTHLY, ROLLOVER_ROWS)
+
+# 'Leads 2026-10' (monthly) or 'Leads 2026-10-17' / 'Leads 2026-10-17 (2)'
+# (rows policy, named after the day the tab was started)
+_TAB_TITLE = re.compile(r'^Leads (\d{4})-(\d{2})(?:-(\d{2}))?(?: \((\d+)\))?$')
+
+# Timestamp column of a row built by GoogleSheetsManager.build_row
+TIMESTAMP_INDEX = 1
+
+# Seconds the list of tabs is trusted before reads look for new ones
+TAB_LIST_TTL = 30.0
+
+
+def _column_letter(count: int) -> str:
+    letters = ''
+    while count:
+        count, remainder = divmod(count - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _row_date(row: List) -> Optional[date]:
+    """Day of a row's 'YYYY-MM-DD HH:MM:SS' timestamp"""
+    try:
+        value = str(row[TIMESTAMP_INDEX])
+        return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except (IndexError, ValueError):
+        return None
+
+
+class Tab:
+    """A rollover worksheet and the first day it can hold"""
+
+    __slots__ = ('title', 'worksheet', 'start', 'monthly', 'seq', 'rows')
+
+    def __init__(self, title: str, worksheet, start: date, monthly: bool, seq: int = 1):
+        self.title = title
+        self.worksheet = worksheet
+        self.start = start
+        self.monthly = monthly
+        self.seq = seq
+        # Lead rows in the tab, counted once and then tracked (rows policy)
+        self.rows: Optional[int] = None
+
+    @classmethod
+    def parse(cls, worksheet) -> Optional['Tab']:
+        match = _TAB_TITLE.match(worksheet.title)
+        if not match:
+            return None
+        year, month, day, seq = match.groups()
+        try:
+            start = date(int(year), int(month), int(day or 1))
+        except ValueError:
+            return None
+        return cls(worksheet.title, worksheet, start, day is None, int(seq or 1))
+
+    def last_day(self, following: Optional['Tab']) -> Optional[date]:
+        """Last day this tab can hold rows for (None: open-ended)"""
+        if self.monthly:
+            return (self.start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        # A day can straddle two row-limited tabs, so the next tab's first
+        # day is also this tab's last
+        return following.start if following else None
+
+
+class WorksheetRollover:
+    """
+    Chooses the worksheet each row is written to.
+
+    With the monthly policy a row goes to the tab for the month of its
+    timestamp ('Leads 2026-10'); with the rows policy it goes to the newest
+    tab until that holds max_rows leads. Tabs are created, with the header
+    row, by the first write that needs them. The active tab is cached, so
+    steady-state writes make no lookups. The worksheet used before rollover
+    was enabled (legacy) is kept for reads of older leads.
+    """
+
+    def __init__(self, spreadsheet, headers: List[str], policy: str = ROLLOVER_MONTHLY,
+                 max_rows: int = 50000, legacy=None):
+        if policy not in (ROLLOVER_MONTHLY, ROLLOVER_ROWS):
+            raise ValueError(f"Unknown rollover policy {policy!r}, expected one of {ROLLOVER_POLICIES}")
+        self.spreadsheet = spreadsheet
+        self.headers = list(headers)
+        self.policy = policy
+        self.max_rows = max(1, int(max_rows))
+        self.legacy = legacy
+        self._tabs: Dict[str, Tab] = {}
+        self._listed_at = 0.0
+        self._active: Optional[Tab] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, spreadsheet, headers: List[str], legacy=None) -> Optional['WorksheetRollover']:
+        """Rollover configured by SHEETS_ROLLOVER and SHEETS_ROLLOVER_ROWS, or None if disabled"""
+        policy = os.getenv('SHEETS_ROLLOVER', ROLLOVER_MONTHLY).lower()
+        if policy == ROLLOVER_NONE:
+            return None
+        return cls(spreadsheet, headers, policy=policy,
+                   max_rows=int(os.getenv('SHEETS_ROLLOVER_ROWS', 50000)), legacy=legacy)
+
+    def _list_tabs(self):
+        tabs = {}
+        for worksheet in self.spreadsheet.worksheets():
+            # Known tabs keep their handle and row count
+            tab = self._tabs.get(worksheet.title) or Tab.parse(worksheet)
+            if tab:
+                tabs[tab.title] = tab
+        self._tabs = tabs
+        self._listed_at = time.monotonic()
+
+    def _ordered(self) -> List[Tab]:
+        return sorted(self._tabs.values(), key=lambda tab: (tab.start, tab.seq))
+
+    def _count_rows(self, tab: Tab) -> int:
+        if tab.rows is None:
+            tab.rows = max(0, len(tab.worksheet.col_values(1)) - 1)
+        return tab.rows
+
+    def _ensure_headers(self, worksheet):
+        if not worksheet.row_values(1):
+            worksheet.update(f"A1:{_column_letter(len(self.headers))}1", [self.headers])
+
+    def _create(self, title: str, start: date, monthly: bool, seq: int = 1) -> Tab:
+        try:
+            worksheet = self.spreadsheet.add_worksheet(
+                title=title,
+                rows=(1000 if monthly else self.max_rows) + 1,
+                cols=len(self.headers)
+            )
+        except Exception:
+            # Another worker may have created it first
+            self._list_tabs()
+            tab = self._tabs.get(title)
+            if tab is None:
+                raise
+            self._ensure_headers(tab.worksheet)
+            return tab
+        self._ensure_headers(worksheet)
+        tab = Tab(title, worksheet, start, monthly, seq)
+        tab.rows = 0
+        self._tabs[title] = tab
+        logger.info(f"Started Google Sheets tab {title!r}")
+        return tab
+
+    def _monthly_tab(self, month: date) -> Tab:
+        title = f"Leads {month:%Y-%m}"
+        active = self._active
+        if active and active.title == title:
+            return active
+        with self._lock:
+            tab = self._tabs.get(title)
+            if tab is None:
+                self._list_tabs()
+                tab = self._tabs.get(title) or self._create(title, month.replace(day=1), True)
+            # Late rows for an earlier month do not move the active tab back
+            if not self._active or tab.start >= self._active.start:
+                self._active = tab
+            return tab
+
+    def _fits(self, tab: Tab, count: int) -> bool:
+        rows = self._count_rows(tab)
+        return rows == 0 or rows + count <= self.max_rows
+
+    def _rows_tab(self, count: int, day: date) -> Tab:
+        active = self._active
+        if active and active.rows is not None and (active.rows == 0 or active.rows + count <= self.max_rows):
+            return active
+        with self._lock:
+            # Another worker may already have rolled over
+            self._list_tabs()
+            ordered = self._ordered()
+            if ordered and self._fits(ordered[-1], count):
+                self._active = ordered[-1]
+                return self._active
+            title, seq = f"Leads {day:%Y-%m-%d}", 1
+            while title in self._tabs:
+                seq += 1
+                title = f"Leads {day:%Y-%m-%d} ({seq})"
+            self._active = self._create(title, day, False, seq)
+            return self._active
+
+    def assign(self, rows: List[List]) -> List[Tuple[object, List[List]]]:
+        """
+        Split rows between the worksheets they belong in
+
+        Returns:
+            list: (worksheet, rows) pairs, oldest tab first
+        """
+        today = date.today()
+        if self.policy == ROLLOVER_ROWS:
+            tab = self._rows_tab(len(rows), _row_date(rows[0]) or today)
+            return [(tab.worksheet, rows)]
+
+        by_month: Dict[date, List[List]] = {}
+        for row in rows:
+            day = _row_date(row) or today
+            by_month.setdefault(day.replace(day=1), []).append(row)
+        return [(self._monthly_tab(month).worksheet, month_rows)
+                for month, month_rows in sorted(by_month.items())]
+
+    def record(self, worksheet, count: int):
+        """Count rows that were appended to a worksheet"""
+        with self._lock:
+            for tab in self._tabs.values():
+                if tab.worksheet is worksheet and tab.rows is not None:
+                    tab.rows += count
+
+    @staticmethod
+    def _legacy_last_day(first: Tab) -> date:
+        """
+        Last day the legacy worksheet can hold leads for: rollover was
+        enabled some time during the first tab's month (or on the first
+        day of a row-limited tab), and leads before that went to the
+        legacy worksheet
+        """
+        return first.last_day(None) if first.monthly else first.start
+
+    def worksheets(self, date_from: date = None, date_to: date = None) -> List:
+        """
+        Worksheets that can hold leads from an inclusive day range, oldest
+        first; the legacy worksheet is included for days up to the end of
+        the first tab's month, since rollover may have started mid-month
+        """
+        with self._lock:
+            if time.monotonic() - self._listed_at > TAB_LIST_TTL:
+                self._list_tabs()
+            ordered = self._ordered()
+
+        selected = []
+        legacy = self.legacy if self.legacy is not None and Tab.parse(self.legacy) is None else None
+        if legacy is not None and (date_from is None or not ordered or date_from <= self._legacy_last_day(ordered[0])):
+            selected.append(legacy)
+        for index, tab in enumerate(ordered):
+            following = ordered[index + 1] if index + 1 < len(ordered) else None
+            last = tab.last_day(following)
+            if date_to is not None and tab.start > date_to:
+                continue
+            if date_from is not None and last is not None and last < date_from:
+                continue
+            selected.append(tab.worksheet)
+        return selected
+
+    def snapshot(self) -> Dict:
+        active = self._active
+        return {
+            'policy': self.policy,
+            'active_tab': active.title if active else None,
+            'active_rows': active.rows if active else None,
+            'tabs': len(self._tabs),
+        }
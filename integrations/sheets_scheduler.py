@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Quota-aware scheduling for Google Sheets writes
+Keeps writes under the per-minute quota and stops calling Sheets during outages
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List
+
+from integrations.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SHEETS_CALLS = REGISTRY.counter(
+    'sheets_append_total', 'append_rows attempts by outcome (ok, error, breaker_open, quota)', ['outcome'])
+SHEETS_ROWS = REGISTRY.counter('sheets_rows_appended_total', 'Rows accepted by Google Sheets')
+SHEETS_LATENCY = REGISTRY.histogram('sheets_append_seconds', 'Latency of append_rows calls to Google Sheets')
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute tokens per minute"""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available without waiting"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until the requested tokens will be available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = tokens - self._tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reports a quota error"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = 0.0
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. While open, calls
+    are refused until reset_timeout has passed, then a single half-open
+    probe decides whether to close again or stay open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be made right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Give back a half-open probe that was never used"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Google Sheets circuit breaker closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Google Sheets circuit breaker opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {'state': self.state, 'failures': self.failures, 'retry_in': round(retry_in, 3)}
+
+
+class QuotaScheduler:
+    """
+    Drop-in wrapper around GoogleSheetsManager for the batched write path.
+
+    append_rows waits (up to max_wait) for a write token and refuses to call
+    Sheets while the breaker is open, returning False so the outbox keeps
+    the rows. Rows that pile up while waiting are sent together in the
+    caller's next, larger batch.
+    """
+
+    def __init__(self, manager, writes_per_minute: float = 60, burst: float = None,
+                 failure_threshold: int = 5, reset_timeout: float = 60.0, max_wait: float = 5.0):
+        self.manager = manager
+        self.bucket = TokenBucket(writes_per_minute, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_wait = max_wait
+        self.calls = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, manager) -> 'QuotaScheduler':
+        """Build a scheduler configured through SHEETS_* environment variables"""
+        burst = os.getenv('SHEETS_WRITE_BURST')
+        return cls(
+            manager,
+            writes_per_minute=float(os.getenv('SHEETS_WRITES_PER_MINUTE', 60)),
+            burst=float(burst) if burst else None,
+            failure_threshold=int(os.getenv('SHEETS_BREAKER_THRESHOLD', 5)),
+            reset_timeout=float(os.getenv('SHEETS_BREAKER_RESET', 60)),
+        )
+
+    def build_row(self, lead_data: Dict) -> List:
+        return self.manager.build_row(lead_data)
+
+    def append_rows(self, rows: List[List]) -> bool:
+        """
+        Append rows if the breaker and quota allow it
+
+        Returns:
+            bool: True if Google Sheets accepted the rows
+        """
+        if not rows:
+            return True
+        if not self.breaker.allow():
+            self.rejected += 1
+            SHEETS_CALLS.labels('breaker_open').inc()
+            return False
+
+        wait = self.bucket.wait_time()
+        if wait > self.max_wait or not self._acquire(wait):
+            # Not a Sheets failure, so only hand back a half-open probe
+            self.breaker.release_probe()
+            self.rejected += 1
+            SHEETS_CALLS.labels('quota').inc()
+            return False
+
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            ok = self.manager.append_rows(rows)
+        except Exception as e:
+            logger.error(f"Error appending rows to Google Sheets: {e}")
+            ok = False
+        SHEETS_LATENCY.observe(time.perf_counter() - start)
+        SHEETS_CALLS.labels('ok' if ok else 'error').inc()
+        if ok:
+            SHEETS_ROWS.inc(len(rows))
+
+        if ok:
+            self.breaker.record_success()
+        else:
+            # Back off from the quota as well as counting the failure
+            self.bucket.drain()
+            self.breaker.record_failure()
+        return ok
+
+    def _acquire(self, wait: float) -> bool:
+        deadline = time.monotonic() + wait + 0.01
+        while not self.bucket.try_acquire():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(remaining, self.bucket.wait_time()) or 0.001)
+        return True
+
+    def snapshot(self) -> Dict:
+        """Breaker state and bucket fill for monitoring"""
+        return {
+            'breaker': self.breaker.snapshot(),
+            'bucket': {
+                'tokens': round(self.bucket.tokens, 3),
+                'capacity': self.bucket.capacity,
+                'writes_per_minute': self.bucket.rate * 60.0,
+            },
+            'calls': self.calls,
+            'rejected': self.rejected,
+        }
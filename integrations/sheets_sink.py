@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Background Google Sheets sink for Dream Axis Lead Collection Website
+Buffers lead rows and writes them with one append_rows call per batch
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsSink:
+    """
+    Buffers sheet rows in memory and flushes them from a background thread.
+
+    A batch is sent once max_batch_size rows are waiting or the oldest row
+    has waited max_delay seconds, whichever comes first. Callers never wait
+    on the Sheets API; flush() and close() exist for graceful shutdown.
+    """
+
+    def __init__(self, manager, max_batch_size: int = 100, max_delay: float = 2.0):
+        self.manager = manager
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+
+        self._pending: List[List] = []
+        self._oldest = 0.0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._flush_requested = False
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the flush thread if it is not running"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='sheets-sink', daemon=True)
+            self._thread.start()
+
+    def submit(self, lead_data: Dict) -> bool:
+        """Queue a lead for the next batch; returns immediately"""
+        return self.submit_row(self.manager.build_row(lead_data))
+
+    def submit_row(self, row: List) -> bool:
+        """Queue an already built sheet row for the next batch"""
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        with self._cond:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(row)
+            self._submitted += 1
+            if len(self._pending) >= self.max_batch_size:
+                self._cond.notify_all()
+        return True
+
+    def submit_many(self, leads: List[Dict]) -> bool:
+        """Queue several leads at once; returns immediately"""
+        rows = [self.manager.build_row(lead) for lead in leads]
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        with self._cond:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend(rows)
+            self._submitted += len(rows)
+            if len(self._pending) >= self.max_batch_size:
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Send everything queued so far and wait for it to be attempted
+
+        Returns:
+            bool: True if all rows were attempted before the timeout
+        """
+        with self._cond:
+            target = self._submitted
+            if self._completed >= target:
+                return True
+            if not (self._thread and self._thread.is_alive()):
+                return False
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._completed >= target, timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> bool:
+        """Drain the buffer and stop the flush thread"""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        return drained
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+            }
+
+    def _ready(self) -> bool:
+        if not self._pending:
+            return False
+        return (self._flush_requested or self._stopping
+                or len(self._pending) >= self.max_batch_size
+                or time.monotonic() - self._oldest >= self.max_delay)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    if self._stopping and not self._pending:
+                        return
+                    if self._pending:
+                        self._cond.wait(max(0.0, self._oldest + self.max_delay - time.monotonic()))
+                    else:
+                        self._cond.wait()
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                if self._pending:
+                    self._oldest = time.monotonic()
+                else:
+                    self._flush_requested = False
+
+            try:
+                ok = self.manager.append_rows(batch)
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} rows to Google Sheets: {e}")
+                ok = False
+
+            with self._cond:
+                self._completed += len(batch)
+                if not ok:
+                    self._failed += len(batch)
+                    logger.error(f"Dropped {len(batch)} leads that could not be saved to Google Sheets")
+                self._cond.notify_all()
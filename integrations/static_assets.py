@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+In-memory static asset cache for the Flask server
+Scans the site's assets once at startup, precompresses them and answers
+conditional requests without touching the filesystem
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only files with these extensions are ever served
+STATIC_EXTENSIONS = {
+    '.html', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
+    '.webp', '.woff', '.woff2',
+}
+
+# Directories under the site root that never hold public assets
+EXCLUDED_DIRS = {'api', 'integrations', 'benchmarks', 'leads', '__pycache__', 'node_modules'}
+
+# Types worth compressing; images and fonts are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'image/svg+xml')
+
+# Files larger than this are served from disk instead of memory
+MAX_CACHED_BYTES = 1024 * 1024
+
+# Hashed (?v=...) URLs never change, so browsers may keep them for a year;
+# anything else must be revalidated with its ETag
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# href="..." / src="..." in HTML and url(...) in CSS
+_HTML_REF = re.compile(r'''(\b(?:href|src)=")([^"]+)(")''')
+_CSS_REF = re.compile(r'''(url\(\s*['"]?)([^'")]+)(['"]?\s*\))''')
+
+
+class Asset:
+    """One file's bytes, precompressed variants and validators"""
+
+    __slots__ = ('path', 'mimetype', 'content_type', 'data', 'variants', 'digest', 'size')
+
+    def __init__(self, path: str, mimetype: str, data: Optional[bytes], digest: str, size: int):
+        self.path = path
+        self.mimetype = mimetype
+        textual = mimetype.startswith('text/') or mimetype in ('application/javascript', 'image/svg+xml')
+        self.content_type = f"{mimetype}; charset=utf-8" if textual else mimetype
+        self.data = data
+        self.digest = digest
+        self.size = size
+        # encoding -> (body, strong ETag)
+        self.variants: Dict[str, Tuple[bytes, str]] = {}
+        if data is not None:
+            self.variants['identity'] = (data, f'"{digest}"')
+
+    @property
+    def cached(self) -> bool:
+        return self.data is not None
+
+    def add_variant(self, encoding: str, body: bytes):
+        # Only keep a variant if it actually saves bytes
+        if len(body) < len(self.data):
+            self.variants[encoding] = (body, f'"{self.digest}-{encoding}"')
+
+
+def _is_compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def preferred_encodings(accept_encoding: str) -> List[str]:
+    """Encodings the client accepts, best first (q=0 excluded)"""
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    return [encoding for encoding in ('br', 'gzip') if encoding in accepted]
+
+
+class StaticAssets:
+    """
+    Every public file under a site root, scanned once.
+
+    Files up to max_cached_bytes are held in memory together with gzip and
+    (if the brotli package is installed) brotli variants and a strong ETag
+    per variant. References between assets in HTML and CSS are rewritten to
+    content-hashed URLs (styles.css?v=<hash>), which are served with an
+    immutable Cache-Control; plain URLs are revalidated with If-None-Match.
+    """
+
+    def __init__(self, root, max_cached_bytes: int = MAX_CACHED_BYTES):
+        self.root = Path(root).resolve()
+        self.max_cached_bytes = max_cached_bytes
+        self.assets: Dict[str, Asset] = {}
+        self.scan()
+
+    def _public_files(self) -> List[Path]:
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in EXCLUDED_DIRS]
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                if not filename.startswith('.') and path.suffix.lower() in STATIC_EXTENSIONS:
+                    files.append(path)
+        return files
+
+    def scan(self):
+        """(Re)load every asset under the root"""
+        assets: Dict[str, Asset] = {}
+        sources: Dict[str, bytes] = {}
+        for path in self._public_files():
+            relative = path.relative_to(self.root).as_posix()
+            mimetype = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+            size = path.stat().st_size
+            if size > self.max_cached_bytes:
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:16]
+                assets[relative] = Asset(relative, mimetype, None, digest, size)
+            else:
+                sources[relative] = path.read_bytes()
+                assets[relative] = None
+
+        # Assets that reference others are built after them, so a change to
+        # an image changes the hash of the CSS and HTML that point to it
+        order = sorted(sources, key=lambda p: {'.css': 1, '.html': 2}.get(Path(p).suffix.lower(), 0))
+        for relative in order:
+            data = sources[relative]
+            suffix = Path(relative).suffix.lower()
+            if suffix in ('.css', '.html'):
+                data = self._rewrite(relative, data, assets, _CSS_REF if suffix == '.css' else _HTML_REF)
+            mimetype = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            asset = Asset(relative, mimetype, data, digest, len(data))
+            if _is_compressible(mimetype):
+                asset.add_variant('gzip', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    asset.add_variant('br', brotli.compress(data, quality=11))
+            assets[relative] = asset
+
+        self.assets = assets
+        cached = sum(1 for asset in assets.values() if asset.cached)
+        logger.info(f"Static assets: {len(assets)} files, {cached} cached in memory"
+                    f"{'' if brotli else ' (brotli not installed)'}")
+
+    def _rewrite(self, relative: str, data: bytes, assets: Dict[str, Optional[Asset]], pattern) -> bytes:
+        base = Path(relative).parent
+
+        def replace(match):
+            url = match.group(2)
+            if ':' in url or url.startswith(('//', '#', 'data:')) or '?' in url:
+                return match.group(0)
+            target = url.lstrip('/') if url.startswith('/') else (base / url).as_posix()
+            asset = assets.get(os.path.normpath(target).replace(os.sep, '/'))
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}{url}?v={asset.digest}{match.group(3)}"
+
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            return data
+        return pattern.sub(replace, text).encode('utf-8')
+
+    def url_for(self, relative: str) -> str:
+        """Content-hashed URL of an asset"""
+        asset = self.assets.get(relative)
+        return f"/{relative}?v={asset.digest}" if asset else f"/{relative}"
+
+    def get(self, relative: str) -> Optional[Asset]:
+        return self.assets.get(relative)
+
+    def file_path(self, asset: Asset) -> Path:
+        return self.root / asset.path
+
+    def respond(self, asset: Asset, accept_encoding: str = '', if_none_match: str = '',
+                version: str = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Pick the best variant of a cached asset for a request
+
+        Returns:
+            tuple: (status, headers, body) with status 200 or 304
+        """
+        encoding = 'identity'
+        for candidate in preferred_encodings(accept_encoding):
+            if candidate in asset.variants:
+                encoding = candidate
+                break
+        body, etag = asset.variants[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if version == asset.digest else REVALIDATE_CACHE_CONTROL,
+        }
+        if len(asset.variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, headers, b''
+
+        headers['Content-Type'] = asset.content_type
+        headers['Content-Length'] = str(len(body))
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return 200, headers, body
+
+    def stats(self) -> Dict:
+        cached = [asset for asset in self.assets.values() if asset.cached]
+        return {
+            'files': len(self.assets),
+            'cached': len(cached),
+            'cached_bytes': sum(len(body) for asset in cached for body, _ in asset.variants.values()),
+            'brotli': brotli is not None,
+        }
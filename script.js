@@ -80,6 +80,20 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // One Idempotency-Key per set of form values, reused when the same
+    // submission is retried so the server does not store it twice
+    let idempotencyKey = null;
+    form.addEventListener('input', function() {
+        idempotencyKey = null;
+    });
+    
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+    
     // Form submission
     form.addEventListener('submit', async function(e) {
         e.preventDefault();
@@ -109,12 +123,17 @@ document.addEventListener('DOMContentLoaded', function() {
             timestamp: new Date().toISOString()
         };
         
+        if (!idempotencyKey) {
+            idempotencyKey = newIdempotencyKey();
+        }
+        
         try {
             // Send data to backend
             const response = await fetch('/api/submit-lead', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Idempotency-Key': idempotencyKey,
                 },
                 body: JSON.stringify(formData)
             });
@@ -141,6 +160,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 console.log('Success! Showing success message');
                 showMessage('success', '✅ Thank you! Your information has been submitted successfully. Our team will contact you within 24 hours.');
                 form.reset();
+                idempotencyKey = null;
             } else {
                 // Response was OK but success is false or missing
                 console.error('Response OK but success is not true:', result);
@@ -1,19 +1,41 @@
 #!/usr/bin/env python3
 """
 Backend server for Dream Axis Lead Collection Website
-Handles form submissions and saves to daily_leads.json
+Handles form submissions and saves them to the append-only lead store
 """
 
 import os
 import json
 import logging
 import sys
+import time
+import atexit
+import threading
+import uuid
+import hmac
+import functools
 from datetime import datetime, date
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, stream_with_context, g
 from flask_cors import CORS
 from pathlib import Path
 from dotenv import load_dotenv
 
+from integrations.lead_store import LeadStore
+from integrations.lead_writer import GroupCommitWriter
+from integrations.lead_index import LeadIndex, parse_day
+from integrations.lead_rollups import LeadRollups
+from integrations.lead_dedup import DedupIndex, ACTION_MERGE
+from integrations.lead_schema import SERVICES, validate_lead
+from integrations.lead_export import EXPORT_FORMATS, MIMETYPES, export_leads
+from integrations.lead_bulk import BulkFormatError, FORMATS, detect_format, iter_records, batched
+from integrations.idempotency import IdempotencyCache, MAX_KEY_LENGTH, REPLAY, IN_PROGRESS
+from integrations.static_assets import StaticAssets, MAX_CACHED_BYTES, preferred_encodings
+from integrations.metrics import REGISTRY, PROFILER, CONTENT_TYPE
+from integrations.admission import AdmissionController, ADMITTED
+from integrations.sheets_sink import SheetsSink
+from integrations.sheets_outbox import SheetsOutbox
+from integrations.sheets_scheduler import QuotaScheduler
+
 # Configure logging first
 logging.basicConfig(
     level=logging.INFO,
@@ -53,164 +75,292 @@ try:
         logger.warning("Google Sheets integration failed to initialize")
 except ImportError as e:
     GOOGLE_SHEETS_AVAILABLE = False
+    sheets_manager = None
     logger.warning(f"Google Sheets integration not available: {e}")
 except Exception as e:
     GOOGLE_SHEETS_AVAILABLE = False
     sheets_manager = None
     logger.warning(f"Google Sheets integration error: {e}")
 
+# Record sheet rows in a durable outbox and deliver them in the background,
+# so requests never wait on Google and failed writes are retried. Delivery
+# goes through a quota scheduler and circuit breaker.
+sheets_sink = None
+sheets_scheduler = None
+if GOOGLE_SHEETS_AVAILABLE:
+    sheets_scheduler = QuotaScheduler.from_env(sheets_manager)
+    sheets_batch_size = int(os.getenv('SHEETS_MAX_BATCH', 100))
+    sheets_max_delay = float(os.getenv('SHEETS_MAX_DELAY', 2.0))
+    try:
+        sheets_sink = SheetsOutbox(
+            os.getenv('SHEETS_OUTBOX', BASE_DIR / 'sheets_outbox.db'),
+            sheets_scheduler,
+            max_batch_size=sheets_batch_size,
+            max_delay=sheets_max_delay
+        )
+        logger.info(f"Sheets outbox ready with {sheets_sink.pending()} pending leads")
+    except Exception as e:
+        logger.warning(f"Sheets outbox unavailable, using in-memory sink: {e}")
+        sheets_sink = SheetsSink(sheets_scheduler, max_batch_size=sheets_batch_size, max_delay=sheets_max_delay)
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Path to daily_leads.json (in Website_assistant directory)
+# Path to the legacy daily_leads.json (migrated into the lead store on startup)
 DAILY_LEADS_FILE = BASE_DIR / 'daily_leads.json'
 
+# Append-only lead store with one NDJSON segment per day
+LEADS_DIR = Path(os.getenv('LEADS_DIR', BASE_DIR / 'leads'))
+lead_store = LeadStore(LEADS_DIR)
+lead_store.migrate_from_json(DAILY_LEADS_FILE)
+
+# Single background writer that commits submissions to the store in batches
+lead_writer = GroupCommitWriter.from_env(lead_store)
+
+# Secondary indexes for /api/leads, rebuilt now and kept up to date by
+# tailing the store after each submission
+lead_index = LeadIndex(lead_store)
+
+# Repeat submissions (same phone or email for the same service within
+# DEDUP_WINDOW_DAYS) are tagged with duplicate_of and not sent to Sheets,
+# or dropped entirely with DEDUP_ACTION=merge (the original lead is not
+# updated with the repeat's fields). DEDUP_WINDOW_DAYS=0 disables.
+DEDUP_ACTION = os.getenv('DEDUP_ACTION', 'tag')
+lead_dedup = None
+dedup_window_days = float(os.getenv('DEDUP_WINDOW_DAYS', 7))
+if dedup_window_days > 0:
+    lead_dedup = DedupIndex(
+        window_seconds=dedup_window_days * 86400,
+        use_bloom=os.getenv('DEDUP_BLOOM', '1') != '0'
+    )
+    # Fed from the index, so it is rebuilt with it and sees other workers' leads
+    lead_index.listeners.append(lead_dedup.observe)
+
+lead_index.rebuild()
+
+# Lead counts per day by service, place and hour for /api/stats, kept up to
+# date on every submission and checkpointed, so a restart only counts leads
+# stored since the last checkpoint
+lead_rollups = LeadRollups(lead_store, os.getenv('LEADS_ROLLUPS', LEADS_DIR / 'rollups.json'))
+lead_rollups.load()
+
+# Latency of each stage of a submission and outcome counts, exposed with
+# Sheets and lead store metrics at /api/metrics. Stage children are bound
+# once so recording costs a lock and a bisect per stage.
+SUBMIT_STAGES = REGISTRY.histogram(
+    'lead_submit_stage_seconds', 'Time spent in each stage of a lead submission', ['stage'])
+STAGE_PARSE, STAGE_VALIDATE, STAGE_STORE, STAGE_SHEETS, STAGE_TOTAL = (
+    SUBMIT_STAGES.labels(stage) for stage in ('parse', 'validate', 'store', 'sheets', 'total'))
+SUBMISSIONS = REGISTRY.counter(
+    'leads_submitted_total', 'Lead submissions by service and outcome', ['service', 'outcome'])
+
+def service_label(service):
+    """Metric label for a submitted service; clients can send any string"""
+    return service if isinstance(service, str) and service in SERVICES else 'unknown'
+
+REGISTRY.gauge('lead_store_bytes', 'Size of the lead store on disk', lead_store.size_bytes)
+REGISTRY.gauge('leads_indexed', 'Leads held in the query index', lambda: len(lead_index))
+REGISTRY.gauge('lead_writer_queue', 'Submissions waiting for the lead writer', lead_writer.queue_depth)
+
+# Endpoints that return lead details are only enabled when LEADS_API_TOKEN
+# is set, and require it as a bearer token
+LEADS_API_TOKEN = os.getenv('LEADS_API_TOKEN')
+MAX_PAGE_SIZE = 500
+
+def require_api_token(view):
+    """Reject requests without the LEADS_API_TOKEN bearer token"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not LEADS_API_TOKEN:
+            return jsonify({'error': 'Leads API is disabled'}), 404
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {LEADS_API_TOKEN}'.encode()):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# First response per Idempotency-Key, so client retries are not stored twice;
+# set IDEMPOTENCY_DB to share it between workers
+idempotency = IdempotencyCache.from_env()
+
+def idempotent(view):
+    """Replay the stored response when a request repeats an Idempotency-Key"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+        
+        key = f"{request.path}:{key}"
+        outcome, stored = idempotency.reserve(key)
+        if outcome == REPLAY:
+            response = jsonify(stored[1])
+            response.status_code = stored[0]
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == IN_PROGRESS:
+            return jsonify({'error': 'A request with this Idempotency-Key is already in progress'}), 409
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency.release(key)
+            raise
+        # Server errors are not remembered so the client can retry them
+        if response.status_code >= 500:
+            idempotency.release(key)
+        else:
+            idempotency.complete(key, response.status_code, response.get_json())
+        return response
+    return wrapper
+
 def load_daily_leads():
-    """Load daily leads from JSON file"""
+    """Load daily leads in the {"dd_mm_YYYY": [...]} shape of daily_leads.json"""
     try:
-        if DAILY_LEADS_FILE.exists():
-            with open(DAILY_LEADS_FILE, 'r') as f:
-                return json.load(f)
+        return lead_store.load_all()
     except Exception as e:
         logger.error(f"Error loading daily leads: {e}")
     return {}
 
-def save_daily_leads(data):
-    """Save daily leads to JSON file"""
-    try:
-        with open(DAILY_LEADS_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+def lead_day(lead_data):
+    """Stamp a lead with the current time and return the day it is stored under"""
+    lead_data['timestamp'] = datetime.now().strftime("%H:%M:%S")
+    return date.today().strftime("%d_%m_%Y")
+
+def lead_committed(day, saved):
+    """Index a lead once its store write has finished, and log the outcome"""
+    if saved:
+        lead_index.sync(day)
+        lead_rollups.sync(day)
+        logger.info(f"Lead saved successfully for {day}")
         return True
-    except Exception as e:
-        logger.error(f"Error saving daily leads: {e}")
-        return False
+    logger.error("Failed to save lead data")
+    return False
 
 def save_lead_to_daily_data(lead_data):
     """Save lead data to daily storage"""
-    today = date.today().strftime("%d_%m_%Y")
+    day = lead_day(lead_data)
+    # Wait until the batch containing this lead has been committed
+    return lead_committed(day, lead_writer.write(day, lead_data))
+
+def prepare_submission(data):
+    """
+    Validate a submission and check it for duplicates
+
+    Shared by the Flask view and the ASGI app (asgi.py).
+
+    Returns:
+        tuple: (lead, lead_data, duplicate_of, response) where response is
+               a (body, status) pair to return without storing anything,
+               or None if the lead should be stored
+    """
+    # Validate and normalise against the shared lead schema
+    lead, error = validate_lead(data)
+    if error:
+        service = data.get('service') if isinstance(data, dict) else None
+        SUBMISSIONS.labels(service_label(service), 'invalid').inc()
+        return None, None, None, (error, 400)
     
-    # Load existing data
-    daily_leads = load_daily_leads()
+    # Prepare lead data; the id also goes into the sheet's User ID column
+    lead_data = {'id': uuid.uuid4().hex, **lead.record}
     
-    if today not in daily_leads:
-        daily_leads[today] = []
+    # Recognise repeat submissions before doing any storage work
+    duplicate_of = lead_dedup.claim(lead_data) if lead_dedup else None
+    if duplicate_of is not None:
+        logger.info(f"Duplicate lead for {lead.service} (original: {duplicate_of or 'unknown'})")
+        if DEDUP_ACTION == ACTION_MERGE:
+            SUBMISSIONS.labels(service_label(lead.service), 'merged').inc()
+            return lead, lead_data, duplicate_of, ({
+                'success': True,
+                'message': 'Lead submitted successfully'
+            }, 200)
+        lead_data['duplicate_of'] = duplicate_of
+    return lead, lead_data, duplicate_of, None
+
+def complete_submission(lead, lead_data, duplicate_of, json_saved):
+    """
+    Queue a stored lead for Google Sheets and build the response
+
+    Returns:
+        tuple: (body, status)
+    """
+    # Queue for Google Sheets if available (duplicates are not re-sent)
+    sheets_queued = False
+    if sheets_sink and duplicate_of is None:
+        start = time.perf_counter()
+        try:
+            sheets_queued = sheets_sink.submit(lead.sheet_data(lead_data['id']))
+        except Exception as e:
+            logger.error(f"Error queueing lead for Google Sheets: {e}")
+        STAGE_SHEETS.observe(time.perf_counter() - start)
     
-    # Add timestamp to lead data
-    lead_data['timestamp'] = datetime.now().strftime("%H:%M:%S")
-    daily_leads[today].append(lead_data)
+    if not json_saved and lead_dedup and duplicate_of is None:
+        # The lead was claimed but never stored; let the client's retry through
+        lead_dedup.release(lead_data)
+    outcome = 'error' if not json_saved else 'duplicate' if duplicate_of is not None else 'stored'
+    SUBMISSIONS.labels(service_label(lead.service), outcome).inc()
     
-    # Save to JSON file
-    if save_daily_leads(daily_leads):
-        logger.info(f"Lead saved successfully for {today}")
-        return True
-    else:
-        logger.error("Failed to save lead data")
-        return False
+    # Return success if at least one save method worked
+    if json_saved:
+        message = 'Lead submitted successfully'
+        if sheets_queued:
+            message += ' and queued for Google Sheets'
+        return {
+            'success': True,
+            'message': message
+        }, 200
+    return {
+        'error': 'Failed to save lead data'
+    }, 500
+
+# Per-client and global rate limits and a concurrency cap on submissions,
+# checked before the body is read; set ADMISSION_TRUSTED_PROXIES when
+# running behind a reverse proxy so clients are told apart
+admission = AdmissionController.from_env()
+ADMISSION_PATHS = {'/api/submit-lead'}
+
+@app.before_request
+def admit_submission():
+    """Turn away submissions over the limits with 429 and Retry-After"""
+    if request.method != 'POST' or request.path not in ADMISSION_PATHS:
+        return None
+    client = admission.client(request.remote_addr, request.headers.get('X-Forwarded-For'))
+    outcome, retry_after = admission.admit(client)
+    if outcome != ADMITTED:
+        response = jsonify({'error': 'Too many requests, please try again shortly'})
+        response.status_code = 429
+        response.headers['Retry-After'] = admission.retry_after_header(retry_after)
+        return response
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def release_submission(exc=None):
+    if g.pop('admitted', False):
+        admission.release()
 
 @app.route('/api/submit-lead', methods=['POST'])
+@idempotent
 def submit_lead():
     """Handle lead form submission"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['service', 'name', 'phone', 'email', 'place']
-        missing_fields = [field for field in required_fields if not data.get(field)]
-        
-        if missing_fields:
-            return jsonify({
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
-        
-        # Validate service-specific fields
-        service = data.get('service')
-        if service == 'Education India':
-            if not data.get('education_place') or not data.get('course'):
-                return jsonify({
-                    'error': 'Missing required fields for Education India: education_place, course'
-                }), 400
-        elif service == 'Education Abroad':
-            if not data.get('education_country'):
-                return jsonify({
-                    'error': 'Missing required field for Education Abroad: education_country'
-                }), 400
-        elif service == 'Job Europe':
-            if not data.get('work'):
-                return jsonify({
-                    'error': 'Missing required field for Job Europe: work'
-                }), 400
-        
-        # Prepare lead data
-        lead_data = {
-            'service': service,
-            'name': data.get('name'),
-            'phone': data.get('phone'),
-            'email': data.get('email'),
-            'place': data.get('place')
-        }
-        
-        # Add service-specific data
-        if service == 'Education India':
-            lead_data['education_place'] = data.get('education_place')
-            lead_data['course'] = data.get('course')
-        elif service == 'Education Abroad':
-            lead_data['education_country'] = data.get('education_country')
-        elif service == 'Job Europe':
-            lead_data['work'] = data.get('work')
-        
-        # Save lead data to daily_leads.json
-        json_saved = save_lead_to_daily_data(lead_data)
-        
-        # Save to Google Sheets if available
-        sheets_saved = False
-        if GOOGLE_SHEETS_AVAILABLE and sheets_manager:
-            try:
-                # Prepare data for Google Sheets (matching expected format)
-                sheets_data = {
-                    'user_id': '',  # Not applicable for web form
-                    'service_type': lead_data.get('service', ''),
-                    'place': lead_data.get('place', ''),
-                    'name': lead_data.get('name', ''),
-                    'phone': lead_data.get('phone', ''),
-                    'email': lead_data.get('email', ''),
-                    'documents': '',
-                    'notes': ''
-                }
-                
-                # Add service-specific details to notes
-                notes_parts = []
-                if service == 'Education India':
-                    notes_parts.append(f"Place: {lead_data.get('education_place', '')}")
-                    notes_parts.append(f"Course: {lead_data.get('course', '')}")
-                elif service == 'Education Abroad':
-                    notes_parts.append(f"Country: {lead_data.get('education_country', '')}")
-                elif service == 'Job Europe':
-                    notes_parts.append(f"Job Type: {lead_data.get('work', '')}")
-                
-                if notes_parts:
-                    sheets_data['notes'] = ' | '.join(notes_parts)
-                
-                sheets_saved = sheets_manager.save_lead(sheets_data)
-                if sheets_saved:
-                    logger.info("Lead saved to Google Sheets successfully")
-                else:
-                    logger.warning("Failed to save lead to Google Sheets, but continuing...")
-            except Exception as e:
-                logger.error(f"Error saving to Google Sheets: {e}")
-        
-        # Return success if at least one save method worked
-        if json_saved:
-            message = 'Lead submitted successfully'
-            if sheets_saved:
-                message += ' and saved to Google Sheets'
-            return jsonify({
-                'success': True,
-                'message': message
-            }), 200
-        else:
-            return jsonify({
-                'error': 'Failed to save lead data'
-            }), 500
+        start = time.perf_counter()
+        data = request.get_json(silent=True)
+        parsed = time.perf_counter()
+        STAGE_PARSE.observe(parsed - start)
+        lead, lead_data, duplicate_of, response = prepare_submission(data)
+        validated = time.perf_counter()
+        STAGE_VALIDATE.observe(validated - parsed)
+        if response is None:
+            # Save lead data to the lead store
+            json_saved = save_lead_to_daily_data(lead_data)
+            STAGE_STORE.observe(time.perf_counter() - validated)
+            response = complete_submission(lead, lead_data, duplicate_of, json_saved)
+        body, status = response
+        STAGE_TOTAL.observe(time.perf_counter() - start)
+        return jsonify(body), status
             
     except Exception as e:
         logger.error(f"Error processing lead submission: {e}")
@@ -219,45 +369,345 @@ def submit_lead():
             'details': str(e)
         }), 500
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
+@app.route('/api/leads', methods=['GET'])
+@require_api_token
+def list_leads():
+    """Query stored leads by date, service, phone, email or place"""
+    args = request.args
+    try:
+        limit = max(1, min(int(args.get('limit', 50)), MAX_PAGE_SIZE))
+        cursor = int(args.get('cursor', -1))
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be integers'}), 400
+    for bound in ('date', 'from', 'to'):
+        if args.get(bound) and parse_day(args[bound]) is None:
+            return jsonify({'error': f'{bound} must be a date (YYYY-MM-DD or DD_MM_YYYY)'}), 400
+    
+    leads, next_cursor = lead_index.query(
+        day=args.get('date'),
+        date_from=args.get('from'),
+        date_to=args.get('to'),
+        service=args.get('service'),
+        phone=args.get('phone'),
+        email=args.get('email'),
+        place=args.get('place'),
+        cursor=cursor,
+        limit=limit
+    )
     return jsonify({
+        'leads': leads,
+        'count': len(leads),
+        'next_cursor': str(next_cursor) if next_cursor is not None else None
+    }), 200
+
+@app.route('/api/stats', methods=['GET'])
+@require_api_token
+def lead_stats():
+    """Lead counts by service, place, hour and day, optionally for a date range"""
+    args = request.args
+    date_from = args.get('from') or args.get('date')
+    date_to = args.get('to') or args.get('date')
+    start = parse_day(date_from) if date_from else None
+    end = parse_day(date_to) if date_to else None
+    if (date_from and start is None) or (date_to and end is None):
+        return jsonify({'error': 'Dates must be YYYY-MM-DD or DD_MM_YYYY'}), 400
+    
+    # Picks up leads other workers stored since this one last synced
+    lead_rollups.sync()
+    return jsonify(lead_rollups.summary(start, end)), 200
+
+# Bulk uploads are validated, stored and queued for Sheets this many
+# records at a time, which bounds memory whatever the upload size
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 500))
+
+def ingest_bulk_batch(batch):
+    """
+    Validate a batch of (index, record) pairs and store the valid leads in
+    one commit
+
+    Returns:
+        tuple: (per-record results, number of leads queued for Google Sheets)
+    """
+    today = date.today().strftime("%d_%m_%Y")
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    results = []
+    stored = []
+    sheet_leads = []
+    
+    for index, record in batch:
+        if isinstance(record, str):
+            results.append({'index': index, 'status': 'invalid', 'error': record})
+            continue
+        lead, error = validate_lead(record)
+        if error:
+            results.append({'index': index, 'status': 'invalid', **error})
+            continue
+        
+        lead_data = {'id': uuid.uuid4().hex, **lead.record, 'timestamp': timestamp}
+        result = {'index': index, 'status': 'created', 'id': lead_data['id']}
+        duplicate_of = lead_dedup.claim(lead_data) if lead_dedup else None
+        if duplicate_of is not None:
+            result['status'] = 'duplicate'
+            result['duplicate_of'] = duplicate_of
+            if DEDUP_ACTION == ACTION_MERGE:
+                del result['id']
+                results.append(result)
+                continue
+            lead_data['duplicate_of'] = duplicate_of
+        else:
+            sheet_leads.append(lead.sheet_data(lead_data['id']))
+        stored.append((today, lead_data))
+        results.append(result)
+    
+    if not stored:
+        return results, 0
+    if not lead_writer.write_many(stored):
+        logger.error(f"Failed to save {len(stored)} bulk leads")
+        if lead_dedup:
+            for _, lead_data in stored:
+                if 'duplicate_of' not in lead_data:
+                    lead_dedup.release(lead_data)
+        for result in results:
+            if 'id' in result:
+                result['status'] = 'failed'
+                del result['id']
+        return results, 0
+    lead_index.sync(today)
+    lead_rollups.sync(today)
+    
+    # The outbox sends these in append_rows calls of up to SHEETS_MAX_BATCH rows
+    sheets_queued = 0
+    if sheets_sink and sheet_leads:
+        try:
+            if sheets_sink.submit_many(sheet_leads):
+                sheets_queued = len(sheet_leads)
+        except Exception as e:
+            logger.error(f"Error queueing bulk leads for Google Sheets: {e}")
+    return results, sheets_queued
+
+def ingest_bulk(records):
+    """Process records batch by batch, yielding the JSON response as it goes"""
+    summary = {'created': 0, 'duplicate': 0, 'invalid': 0, 'failed': 0, 'sheets_queued': 0}
+    error = None
+    separator = ''
+    
+    yield '{"results": ['
+    try:
+        for batch in batched(records, BULK_BATCH_SIZE):
+            if isinstance(batch[-1][1], BulkFormatError):
+                error = str(batch.pop()[1])
+            results, sheets_queued = ingest_bulk_batch(batch)
+            summary['sheets_queued'] += sheets_queued
+            for result in results:
+                summary[result['status']] += 1
+            if results:
+                yield separator + ','.join(json.dumps(result) for result in results)
+                separator = ','
+    except Exception as e:
+        logger.error(f"Error processing bulk upload: {e}")
+        error = 'Internal server error'
+    
+    logger.info(f"Bulk upload processed: {summary}")
+    tail = {'summary': summary}
+    if error:
+        tail['error'] = error
+    yield '], ' + json.dumps(tail)[1:]
+
+@app.route('/api/leads/bulk', methods=['POST'])
+@require_api_token
+def bulk_leads():
+    """
+    Ingest many leads from a JSON array, NDJSON or CSV body
+
+    The body is read as a stream and the response lists a result per record
+    ({index, status, id | errors}) followed by a summary, streamed as each
+    batch is committed.
+    """
+    fmt = detect_format(request.content_type, request.args.get('format'))
+    if not fmt:
+        return jsonify({'error': f'Unsupported format, expected one of: {", ".join(FORMATS)}'}), 415
+    records = iter_records(request.stream, fmt)
+    return app.response_class(stream_with_context(ingest_bulk(records)), mimetype='application/json')
+
+@app.route('/api/leads/export', methods=['GET'])
+@require_api_token
+def export_leads_view():
+    """
+    Stream stored leads as CSV, NDJSON or JSON
+
+    Query parameters: format (csv, ndjson or json), from and to (inclusive days),
+    service. The body is gzipped when the client accepts it, unless
+    compress=0 is given.
+    """
+    args = request.args
+    fmt = args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    for bound in ('from', 'to'):
+        if args.get(bound) and parse_day(args[bound]) is None:
+            return jsonify({'error': f'{bound} must be a date (YYYY-MM-DD)'}), 400
+    
+    compress = args.get('compress') != '0' and 'gzip' in preferred_encodings(request.headers.get('Accept-Encoding', ''))
+    chunks = export_leads(lead_store, fmt, date_from=args.get('from'), date_to=args.get('to'),
+                          service=args.get('service') or None, compress=compress)
+    
+    response = app.response_class(chunks, mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=leads.{fmt}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def health_status():
+    """Health report shared by the Flask view and the ASGI app"""
+    health = {
         'status': 'healthy',
         'service': 'Dream Axis Lead Collection API'
-    }), 200
+    }
+    if sheets_scheduler:
+        health['google_sheets'] = sheets_scheduler.snapshot()
+        if sheets_manager.rollover:
+            health['google_sheets']['rollover'] = sheets_manager.rollover.snapshot()
+        try:
+            health['google_sheets']['queue'] = sheets_sink.stats()
+        except Exception as e:
+            logger.error(f"Error reading Sheets queue stats: {e}")
+    return health
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_status()), 200
+
+@app.route('/api/metrics', methods=['GET'])
+@require_api_token
+def metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return app.response_class(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+# Longest profile that can be requested in one call
+MAX_PROFILE_SECONDS = 60
+
+@app.route('/api/metrics/profile', methods=['POST'])
+@require_api_token
+def start_profile():
+    """
+    Start sampling every thread's stack for ?seconds=N (default 10) in the
+    background; the stacks are collected with GET once it has finished
+    """
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), MAX_PROFILE_SECONDS)
+        interval = float(request.args.get('interval_ms', 5)) / 1000.0
+    except ValueError:
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    if not PROFILER.start(interval, duration=max(0.0, seconds)):
+        return jsonify({'error': 'A profile is already running'}), 409
+    return jsonify({'running': True, 'seconds': seconds}), 202
+
+@app.route('/api/metrics/profile', methods=['GET'])
+@require_api_token
+def get_profile():
+    """Stacks from the last profile in collapsed format, ready for flamegraph.pl or speedscope"""
+    if PROFILER.running:
+        return jsonify({'running': True, 'remaining': round(PROFILER.remaining(), 1)}), 202
+    if PROFILER.started_at is None:
+        return jsonify({'error': 'No profile has been run'}), 404
+    return app.response_class(PROFILER.collapsed(), mimetype='text/plain')
+
+# Public files (HTML, CSS, JS, images) are scanned once and served from
+# memory, precompressed, with ETags and content-hashed URLs
+static_assets = StaticAssets(
+    BASE_DIR,
+    max_cached_bytes=int(os.getenv('STATIC_MAX_CACHED_BYTES', MAX_CACHED_BYTES))
+)
+
+def static_response(filename):
+    """Serve a scanned asset, answering If-None-Match with 304"""
+    asset = static_assets.get(filename)
+    if asset is None:
+        return jsonify({'error': 'File not found'}), 404
+    if not asset.cached:
+        return send_from_directory(BASE_DIR, filename)
+    
+    status, headers, body = static_assets.respond(
+        asset,
+        accept_encoding=request.headers.get('Accept-Encoding', ''),
+        if_none_match=request.headers.get('If-None-Match', ''),
+        version=request.args.get('v')
+    )
+    return app.response_class(body, status=status, headers=headers)
 
 @app.route('/', methods=['GET'])
 def index():
     """Serve the index page"""
-    return send_from_directory(Path(__file__).parent, 'index.html')
+    return static_response('index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     """Serve static files (CSS, JS, images)"""
-    static_dir = Path(__file__).parent
-    
-    # Security: Prevent directory traversal
-    if '..' in filename or filename.startswith('/'):
-        return jsonify({'error': 'Access denied'}), 403
-    
-    file_path = static_dir / filename
-    
-    # First, try to serve from Website_assistant directory
-    if file_path.exists() and file_path.is_file():
-        # Additional security check
-        try:
-            file_path.resolve().relative_to(static_dir.resolve())
-        except ValueError:
-            return jsonify({'error': 'Access denied'}), 403
-        return send_from_directory(static_dir, filename)
-    
-    return jsonify({'error': 'File not found'}), 404
+    # Only files found by the startup scan can be served, so paths outside
+    # the site (or server code and data next to it) are never reachable
+    return static_response(filename)
+
+# pid of the process whose background threads are running; threads do not
+# survive a fork, so each worker process starts its own
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_work():
+    """Start this process's lead writer and Sheets delivery threads"""
+    global _background_pid
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        lead_writer.start()
+        if sheets_sink:
+            sheets_sink.start()
+        _background_pid = os.getpid()
+
+@app.before_request
+def ensure_background_work():
+    if _background_pid != os.getpid():
+        start_background_work()
+
+def after_fork():
+    """
+    Start background threads in a worker forked from a process that had
+    already imported the app (gunicorn preload_app). The writer, outbox,
+    idempotency store and Sheets client reopen their files and connections
+    themselves when they see a new pid.
+    """
+    start_background_work()
+    logger.info(f"Worker {os.getpid()} ready")
+
+def drain_background_work(timeout=10.0):
+    """Commit queued leads, then deliver queued Sheets rows, before exit"""
+    if _background_pid != os.getpid():
+        return
+    lead_writer.close(timeout)
+    lead_rollups.sync()
+    lead_rollups.checkpoint()
+    if sheets_sink and not sheets_sink.close(timeout):
+        logger.warning("Sheets rows still pending at shutdown; they are retried on next start")
+
+atexit.register(drain_background_work)
+
+def create_app():
+    """
+    WSGI application factory (see wsgi.py and gunicorn.conf.py)
+
+    Importing the app starts no threads, so it can be loaded once and
+    forked; each serving process starts its background threads in
+    after_fork() or on its first request.
+    """
+    return app
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     host = os.environ.get('HOST', '0.0.0.0')
     
+    # Development server; use wsgi.py (gunicorn or waitress) in production
     logger.info(f"Starting Dream Axis Lead Collection Server on {host}:{port}")
-    app.run(host=host, port=port, debug=True)
+    start_background_work()
+    create_app().run(host=host, port=port, debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
 
@@ -31,7 +31,7 @@ echo.
 echo Starting server on http://localhost:5000
 echo Press Ctrl+C to stop the server
 echo.
-python server.py
+python wsgi.py
 
 pause
 
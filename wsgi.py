@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Dream Axis Lead Collection server
+
+Linux/macOS:  gunicorn -c gunicorn.conf.py wsgi:app
+Windows:      python wsgi.py   (serves with waitress)
+"""
+
+import os
+import logging
+
+from server import create_app, start_background_work
+
+logger = logging.getLogger(__name__)
+
+app = create_app()
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    host = os.environ.get('HOST', '0.0.0.0')
+    threads = int(os.environ.get('WEB_THREADS', 8))
+    start_background_work()
+    
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning("waitress is not installed; falling back to the threaded Flask server")
+        app.run(host=host, port=port, threaded=True)
+    else:
+        logger.info(f"Serving Dream Axis Lead Collection on {host}:{port} with {threads} threads")
+        serve(app, host=host, port=port, threads=threads)